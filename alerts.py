@@ -0,0 +1,439 @@
+import os
+import json
+import pickle
+import datetime
+import warnings
+import urllib.request
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from correlation import POSITIONING_NETS, metric_values
+from cot_store import CotStore
+from file_utils import atomic_write, file_lock
+
+ALERT_RULES_FILE = "alert_rules.json"
+ALERT_STATE_FILE = os.path.join("data", "alert_state.pkl")
+ALERT_LOG_FILE = os.path.join("data", "alerts.jsonl")
+
+RULE_KINDS = ("range_position", "zscore", "sign_flip", "change")
+
+StateKey = Tuple[str, str, str, int, str]
+
+
+class RollingState:
+    """
+    Sliding-window statistics of one series, updated one observation at a time.
+
+    Keeps running sum and sum of squares for mean/variance and monotonic deques for the
+    window min/max, so every update is O(1) amortized regardless of the window length.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.previous = None
+        self.last_date = None
+        self._seen = 0
+        self._min = deque()  # (position, value), values increasing
+        self._max = deque()  # (position, value), values decreasing
+
+    def push(self, value: float, date: pd.Timestamp) -> None:
+        self.previous = self.values[-1][1] if self.values else None
+
+        position = self._seen
+        self._seen += 1
+        self.values.append((position, value))
+        self.total += value
+        self.total_sq += value * value
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((position, value))
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((position, value))
+
+        if len(self.values) > self.window:
+            old_position, old_value = self.values.popleft()
+            self.total -= old_value
+            self.total_sq -= old_value * old_value
+            if self._min[0][0] == old_position:
+                self._min.popleft()
+            if self._max[0][0] == old_position:
+                self._max.popleft()
+
+        self.last_date = date
+
+    @property
+    def count(self) -> int:
+        return len(self.values)
+
+    @property
+    def current(self) -> Optional[float]:
+        return self.values[-1][1] if self.values else None
+
+    @property
+    def minimum(self) -> float:
+        return self._min[0][1]
+
+    @property
+    def maximum(self) -> float:
+        return self._max[0][1]
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count
+
+    @property
+    def std(self) -> float:
+        variance = (self.total_sq - self.total * self.total / self.count) / max(self.count - 1, 1)
+        return max(variance, 0.0) ** 0.5
+
+
+def load_rules(path: str = ALERT_RULES_FILE) -> List[Dict]:
+    """
+    Load and validate alert rules from a JSON file (no file means no rules).
+
+    Raises:
+        ValueError: If a rule is malformed.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        return validate_rules(json.load(f))
+
+
+def validate_rules(rules: List[Dict], store: Optional[CotStore] = None) -> List[Dict]:
+    """
+    Check that every rule is well formed.
+
+    Each rule needs an `id`, `dataset`, `type`, one of `net` (a key of POSITIONING_NETS) or
+    `column`, and a `kind` from RULE_KINDS. Optional keys: `window` (weeks, default 156),
+    `min_periods`, `above` / `below` thresholds and `contracts` (defaults to all).
+
+    With a `store`, rules on a stored table are also checked against it: every column the rule
+    reads must be stored, and so must every contract it lists. Only the Parquet footer and the
+    manifest are read.
+
+    Raises:
+        ValueError: If a rule is malformed or does not match its stored table.
+    """
+    ids = set()
+    for rule in rules:
+        missing = [key for key in ("id", "dataset", "type", "kind") if key not in rule]
+        if missing:
+            raise ValueError(f"Alert rule {rule} is missing {', '.join(missing)}")
+        if rule["id"] in ids:
+            raise ValueError(f"Duplicate alert rule id {rule['id']}")
+        ids.add(rule["id"])
+        if rule["kind"] not in RULE_KINDS:
+            raise ValueError(f"Alert rule {rule['id']}: unknown kind {rule['kind']}")
+        if ("net" in rule) == ("column" in rule):
+            raise ValueError(f"Alert rule {rule['id']}: specify exactly one of 'net' or 'column'")
+        if "net" in rule and rule["net"] not in POSITIONING_NETS.get(rule["dataset"], {}):
+            raise ValueError(f"Alert rule {rule['id']}: unknown net {rule['net']} for {rule['dataset']}")
+        if rule["kind"] in ("range_position", "zscore", "change") and "above" not in rule and "below" not in rule:
+            raise ValueError(f"Alert rule {rule['id']}: '{rule['kind']}' needs an 'above' or 'below' threshold")
+        if "contracts" in rule and (
+                not isinstance(rule["contracts"], list) or not all(isinstance(code, str) for code in rule["contracts"])):
+            raise ValueError(f"Alert rule {rule['id']}: 'contracts' must be a list of contract codes")
+
+        if store is not None and store.exists(rule["dataset"], rule["type"]):
+            table = f"{rule['dataset']} {rule['type']}"
+            stored_columns = pq.read_schema(store.path(rule["dataset"], rule["type"])).names
+            missing = [col for col in rule_columns(rule) if col not in stored_columns]
+            if missing:
+                raise ValueError(f"Alert rule {rule['id']}: {table} has no column {', '.join(missing)}")
+            unknown = [code for code in rule.get("contracts", []) if code not in store.last_dates(rule["dataset"], rule["type"])]
+            if unknown:
+                raise ValueError(f"Alert rule {rule['id']}: {table} has no contract {', '.join(unknown)}")
+    return rules
+
+
+def rule_metric(rule: Dict) -> str:
+    return rule.get("net") or rule["column"]
+
+
+def rule_columns(rule: Dict) -> List[str]:
+    """Stored columns a rule reads."""
+    if "net" in rule:
+        longs, shorts = POSITIONING_NETS[rule["dataset"]][rule["net"]]
+        return longs + shorts
+    return [rule["column"]]
+
+
+def evaluate_rule(rule: Dict, state: RollingState) -> Optional[str]:
+    """
+    Check a rule against the latest observation in `state`.
+
+    Returns:
+        Optional[str]: Human-readable alert message, or None if the rule did not fire.
+    """
+    window = rule.get("window", 156)
+    if state.count < rule.get("min_periods", max(2, window // 2)):
+        return None
+
+    value = state.current
+    kind = rule["kind"]
+    above = rule.get("above")
+    below = rule.get("below")
+
+    if kind == "sign_flip":
+        previous = state.previous
+        if previous is not None and previous * value < 0:
+            return f"{rule_metric(rule)} flipped from {previous:,.0f} to {value:,.0f}"
+        return None
+
+    if kind == "range_position":
+        spread = state.maximum - state.minimum
+        if spread <= 0:
+            return None
+        score = (value - state.minimum) / spread
+        label = f"{rule_metric(rule)} at {score:.0%} of its {window}-week range ({value:,.0f})"
+    elif kind == "zscore":
+        std = state.std
+        if std <= 0:
+            return None
+        score = (value - state.mean) / std
+        label = f"{rule_metric(rule)} z-score {score:+.2f} over {window} weeks ({value:,.0f})"
+    else:  # change
+        if state.previous is None:
+            return None
+        score = value - state.previous
+        label = f"{rule_metric(rule)} changed by {score:+,.2f} to {value:,.2f}"
+
+    if (above is not None and score >= above) or (below is not None and score <= below):
+        return label
+    return None
+
+
+class AlertEngine:
+    """
+    Evaluate alert rules incrementally on newly synced rows.
+
+    Rolling state is kept per (dataset, type, metric, window, contract) and shared by every rule
+    that watches the same series, and it is persisted between runs. Each sync only pushes the
+    new weeks through the states instead of rescanning full histories.
+    """
+
+    def __init__(self, rules: List[Dict], state_path: str = ALERT_STATE_FILE):
+        self.rules = rules
+        self.state_path = state_path
+        self.states: Dict[StateKey, RollingState] = {}
+        if os.path.exists(state_path):
+            with open(state_path, "rb") as f:
+                self.states = pickle.load(f)
+
+    def save(self) -> None:
+        atomic_write(self.state_path, pickle.dumps(self.states))
+
+    def tables(self) -> List[Tuple[str, str]]:
+        """(dataset, type) pairs referenced by the rules."""
+        return sorted({(rule["dataset"], rule["type"]) for rule in self.rules})
+
+    def table_rules(self, dataset_code: str, type_category: str, columns: Iterable[str]) -> List[Dict]:
+        """
+        Rules of one table that can be evaluated on `columns`. Rules reading a column the table
+        does not have (e.g. a mistyped name) are skipped with a warning, so the others still run.
+        """
+        columns = set(columns)
+        rules = []
+        for rule in self.rules:
+            if rule["dataset"] != dataset_code or rule["type"] != type_category:
+                continue
+            missing = [col for col in rule_columns(rule) if col not in columns]
+            if missing:
+                warnings.warn(f"Alert rule {rule['id']} skipped: {dataset_code} {type_category} has no column {', '.join(missing)}", UserWarning)
+                continue
+            rules.append(rule)
+        return rules
+
+    def _series(self, rules: List[Dict], dataset_code: str, frame: pd.DataFrame) -> Dict[Tuple[str, int], pd.Series]:
+        series = {}
+        for rule in rules:
+            key = (rule_metric(rule), rule.get("window", 156))
+            if key in series:
+                continue
+            if "net" in rule:
+                series[key] = metric_values(frame, dataset_code, rule["net"])
+            else:
+                series[key] = frame[rule["column"]].astype(float)
+        return series
+
+    def evaluate(self, dataset_code: str, type_category: str, new_rows: pd.DataFrame, emit: bool = True) -> List[Dict]:
+        """
+        Push new rows through the rolling states and evaluate the rules for that table.
+
+        Rows dated on or before a state's last update are ignored, so feeding overlapping
+        batches is safe.
+
+        Args:
+            dataset_code (str): e.g. 'QDL/FON'.
+            type_category (str): e.g. 'F_ALL'.
+            new_rows (pd.DataFrame): Rows not seen before, in store layout.
+            emit (bool): Return alerts; set to False while priming states from history.
+
+        Returns:
+            List[Dict]: Alerts fired on the new rows.
+        """
+        if new_rows.empty:
+            return []
+        rules = self.table_rules(dataset_code, type_category, new_rows.columns)
+        if not rules:
+            return []
+
+        new_rows = new_rows.sort_values(["contract_code", "date"]).reset_index(drop=True)
+        series = self._series(rules, dataset_code, new_rows)
+        codes = new_rows["contract_code"].to_numpy()
+        dates = new_rows["date"].to_numpy()
+
+        alerts = []
+        for (metric, window), values in series.items():
+            watching = [rule for rule in rules if (rule_metric(rule), rule.get("window", 156)) == (metric, window)]
+            for code, date, value in zip(codes, dates, values.to_numpy()):
+                if pd.isna(value):
+                    continue
+                key = (dataset_code, type_category, metric, window, code)
+                state = self.states.get(key)
+                if state is None:
+                    state = self.states[key] = RollingState(window)
+                date = pd.Timestamp(date)
+                if state.last_date is not None and date <= state.last_date:
+                    continue
+                state.push(float(value), date)
+
+                if not emit:
+                    continue
+                for rule in watching:
+                    if "contracts" in rule and code not in rule["contracts"]:
+                        continue
+                    message = evaluate_rule(rule, state)
+                    if message:
+                        alerts.append({
+                            "rule_id": rule["id"],
+                            "dataset": dataset_code,
+                            "type": type_category,
+                            "contract_code": code,
+                            "date": date.strftime("%Y-%m-%d"),
+                            "value": float(value),
+                            "message": message
+                        })
+        return alerts
+
+    def prime(self, store: CotStore) -> None:
+        """
+        Seed states that do not exist yet from the stored history, without emitting alerts.
+        Only the last `window` weeks of each series are read.
+        """
+        for dataset_code, type_category in self.tables():
+            if not store.exists(dataset_code, type_category):
+                continue
+            columns = pq.read_schema(store.path(dataset_code, type_category)).names
+            rules = self.table_rules(dataset_code, type_category, columns)
+            if not rules:
+                continue
+            longest = max(rule.get("window", 156) for rule in rules)
+            last_dates = store.last_dates(dataset_code, type_category)
+            unprimed = [
+                code for code in last_dates
+                if any((dataset_code, type_category, rule_metric(rule), rule.get("window", 156), code) not in self.states
+                       for rule in rules)
+            ]
+            if not unprimed:
+                continue
+            start = min(last_dates[code] for code in unprimed) - pd.Timedelta(weeks=longest)
+            history = store.load(dataset_code, type_category, contract_codes=unprimed, start=start)
+            self.evaluate(dataset_code, type_category, history, emit=False)
+
+
+class FileSink:
+    """Append alerts as JSON lines to a local file (read by the Positioning Alerts page)."""
+
+    def __init__(self, path: str = ALERT_LOG_FILE):
+        self.path = path
+
+    def send(self, alerts: List[Dict]) -> None:
+        if not alerts:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with file_lock(self.path):
+            with open(self.path, "a") as f:
+                for alert in alerts:
+                    f.write(json.dumps(alert) + "\n")
+
+
+class WebhookSink:
+    """POST alerts as a JSON array to a webhook URL."""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alerts: List[Dict]) -> None:
+        if not alerts:
+            return
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(alerts).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+            method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def read_alerts(path: str = ALERT_LOG_FILE, limit: Optional[int] = None) -> pd.DataFrame:
+    """Return logged alerts, newest first."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["rule_id", "dataset", "type", "contract_code", "date", "value", "message", "logged_at"])
+    alerts = pd.read_json(path, lines=True, dtype={"contract_code": str})
+    alerts = alerts.iloc[::-1].reset_index(drop=True)
+    return alerts.head(limit) if limit else alerts
+
+
+def run_scan(
+        store: CotStore,
+        contract_codes: Iterable[str],
+        rules_path: str = ALERT_RULES_FILE,
+        sinks: Optional[List] = None,
+        state_path: str = ALERT_STATE_FILE
+) -> List[Dict]:
+    """
+    Sync every stored and rule-referenced table, then evaluate the rules on the new weeks only.
+
+    Returns:
+        List[Dict]: Alerts that fired, after they were sent to every sink.
+    """
+    engine = AlertEngine(load_rules(rules_path), state_path)
+    sinks = sinks if sinks is not None else [FileSink()]
+    contract_codes = list(contract_codes)
+
+    # Seed missing states from the history stored before this sync, so the new weeks can fire
+    engine.prime(store)
+
+    tables = sorted(set(store.tables()) | set(engine.tables()))
+    stored_before = {table: set(store.last_dates(*table)) for table in tables}
+    new_rows = {table: store.sync(table[0], table[1], contract_codes) for table in tables}
+
+    logged_at = datetime.datetime.now().isoformat(timespec="seconds")
+    alerts = []
+    for (dataset_code, type_category), rows in new_rows.items():
+        # Contracts fetched for the first time (new table or newly registered instrument) arrive
+        # with their whole history: prime on it and only evaluate the latest week
+        first_seen = ~rows["contract_code"].isin(stored_before[(dataset_code, type_category)])
+        if first_seen.any():
+            history = first_seen & (rows["date"] < rows["date"].max())
+            engine.evaluate(dataset_code, type_category, rows[history], emit=False)
+            rows = rows[~history]
+        for alert in engine.evaluate(dataset_code, type_category, rows):
+            alert["logged_at"] = logged_at
+            alerts.append(alert)
+    engine.save()
+
+    for sink in sinks:
+        sink.send(alerts)
+    return alerts
@@ -0,0 +1,230 @@
+import os
+import re
+import glob
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from cot_store import CotStore, DATA_DIR, normalize_table
+from file_utils import file_lock
+from instrument_registry import InstrumentRegistry
+
+TableKey = Tuple[str, str]
+
+CHUNK_SIZE = 50_000
+
+# Participant groups as they appear in the archive headers -> store column prefixes
+DISAGGREGATED_GROUPS = {
+    "prod_merc": "producer_merchant_processor_user",
+    "swap": "swap_dealer",
+    "m_money": "money_manager",
+    "other_rept": "other_reportable",
+    "tot_rept": "total_reportable",
+    "nonrept": "non_reportable",
+}
+LEGACY_GROUPS = {
+    "noncommercial": "non_commercial",
+    "commercial": "commercial",
+    "total_reportable": "total_reportable",
+    "nonreportable": "non_reportable",
+}
+SIDES = {"long": "longs", "short": "shorts", "spread": "spreads", "spreading": "spreads"}
+
+
+def normalize_header(name: str) -> str:
+    """'Swap__Positions_Short_All' / ' Total Reportable Positions-Long (All)' -> snake_case without punctuation."""
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+
+
+def _disaggregated_mappings() -> Dict[str, Dict[str, str]]:
+    """Store category suffix ('ALL', 'CHG', 'ALL_OI', 'ALL_CR') -> {normalized header: store column}."""
+    all_, chg, oi = {"open_interest_all": "market_participation"}, {"change_in_open_interest_all": "market_participation"}, {"pct_of_open_interest_all": "market_participation"}
+    for group, prefix in DISAGGREGATED_GROUPS.items():
+        for side, suffix in SIDES.items():
+            if side == "spreading":
+                continue
+            all_[f"{group}_positions_{side}_all"] = f"{prefix}_{suffix}"
+            chg[f"change_in_{group}_{side}_all"] = f"{prefix}_{suffix}"
+            oi[f"pct_of_oi_{group}_{side}_all"] = f"{prefix}_{suffix}"
+    cr = {}
+    for kind in ("gross", "net"):
+        for size in ("4", "8"):
+            for side in ("long", "short"):
+                cr[f"conc_{kind}_le_{size}_tdr_{side}_all"] = f"largest_{size}_{side}s_{kind}"
+    return {"ALL": all_, "CHG": chg, "ALL_OI": oi, "ALL_CR": cr}
+
+
+def _legacy_mappings() -> Dict[str, Dict[str, str]]:
+    all_, chg, oi = {"open_interest_all": "market_participation"}, {"change_in_open_interest_all": "market_participation"}, {"of_open_interest_oi_all": "market_participation"}
+    for group, prefix in LEGACY_GROUPS.items():
+        for side, suffix in SIDES.items():
+            if side == "spread":
+                continue
+            all_[f"{group}_positions_{side}_all"] = f"{prefix}_{suffix}"
+            chg[f"change_in_{group}_{side}_all"] = f"{prefix}_{suffix}"
+            oi[f"of_oi_{group}_{side}_all"] = f"{prefix}_{suffix}"
+    return {"ALL": all_, "CHG": chg, "ALL_OI": oi}
+
+
+# Report layout -> (dataset per category suffix, type prefix for futures / combined, column mappings)
+LAYOUTS = {
+    "disaggregated": {
+        "marker": "m_money_positions_long_all",
+        "date": "report_date_as_yyyy_mm_dd",
+        "datasets": {"ALL": "QDL/FON", "CHG": "QDL/FON", "ALL_OI": "QDL/FON", "ALL_CR": "QDL/FCR"},
+        "prefixes": {"futures": "F", "combined": "FO"},
+        "mappings": _disaggregated_mappings(),
+    },
+    "legacy": {
+        "marker": "noncommercial_positions_long_all",
+        "date": "as_of_date_in_form_yyyy_mm_dd",
+        "datasets": {"ALL": "QDL/LFON", "CHG": "QDL/LFON", "ALL_OI": "QDL/LFON"},
+        "prefixes": {"futures": "F_L", "combined": "FO_L"},
+        "mappings": _legacy_mappings(),
+    },
+}
+CODE_COLUMN = "cftc_contract_market_code"
+
+
+def _open_report(path: str):
+    """Open an archive file (zip with one report inside, or a plain .txt/.csv)."""
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        members = [name for name in archive.namelist() if name.lower().endswith((".txt", ".csv"))]
+        if len(members) != 1:
+            raise ValueError(f"{path}: expected one report file in the archive, found {len(members)}")
+        return archive.open(members[0])
+    return open(path, "rb")
+
+
+def _is_combined(path: str) -> bool:
+    # Disaggregated: c_YEAR.txt / com_disagg_*; legacy: annualof.txt / deahistfo*
+    name = os.path.basename(path).lower()
+    return name.startswith(("c_", "com", "deahistfo", "annualof"))
+
+
+def iter_report_chunks(path: str, chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[TableKey, pd.DataFrame]]:
+    """
+    Stream one archive file and yield, per chunk of rows, the store tables it contributes to.
+
+    Only the columns that map to store fields are parsed.
+
+    Args:
+        path (str): Annual archive (zip) or extracted report file.
+        chunk_size (int): Rows per parsed chunk.
+
+    Yields:
+        Dict[TableKey, pd.DataFrame]: (dataset, type) -> rows in store layout.
+
+    Raises:
+        ValueError: If the header matches neither the disaggregated nor the legacy layout.
+    """
+    with _open_report(path) as f:
+        header = pd.read_csv(f, nrows=0).columns
+    normalized = {col: normalize_header(col) for col in header}
+    names = set(normalized.values())
+
+    layout = next((layout for layout in LAYOUTS.values() if layout["marker"] in names), None)
+    if layout is None or CODE_COLUMN not in names or layout["date"] not in names:
+        raise ValueError(f"{path}: unrecognized COT report layout")
+
+    prefix = layout["prefixes"]["combined" if _is_combined(path) else "futures"]
+    wanted = {CODE_COLUMN, layout["date"]}
+    for mapping in layout["mappings"].values():
+        wanted.update(col for col in mapping if col in names)
+    usecols = [col for col in header if normalized[col] in wanted]
+
+    with _open_report(path) as f:
+        reader = pd.read_csv(f, usecols=usecols, dtype={col: str for col in usecols}, chunksize=chunk_size)
+        for chunk in reader:
+            chunk.columns = [normalized[col] for col in chunk.columns]
+            base = pd.DataFrame({
+                "contract_code": chunk[CODE_COLUMN].str.strip(),
+                "date": pd.to_datetime(chunk[layout["date"]].str.strip())
+            })
+            tables = {}
+            for suffix, mapping in layout["mappings"].items():
+                present = {src: dst for src, dst in mapping.items() if src in chunk.columns}
+                if not present:
+                    continue
+                values = chunk[list(present)].apply(lambda col: pd.to_numeric(col.str.strip(), errors="coerce"))
+                values.columns = list(present.values())
+                type_category = f"{prefix}_{suffix}"
+                tables[(layout["datasets"][suffix], type_category)] = pd.concat(
+                    [base.assign(type=type_category), values], axis=1
+                )
+            yield tables
+
+
+def parse_report(path: str, contract_codes: Optional[List[str]] = None) -> Dict[TableKey, pd.DataFrame]:
+    """Parse a whole archive file chunk by chunk, keeping only `contract_codes` if given."""
+    parts: Dict[TableKey, List[pd.DataFrame]] = {}
+    for tables in iter_report_chunks(path):
+        for key, frame in tables.items():
+            if contract_codes is not None:
+                frame = frame[frame["contract_code"].isin(contract_codes)]
+            if not frame.empty:
+                parts.setdefault(key, []).append(frame)
+    return {key: pd.concat(frames, ignore_index=True) for key, frames in parts.items()}
+
+
+def import_archives(
+        paths: List[str],
+        store: CotStore,
+        contract_codes: Optional[List[str]] = None,
+        workers: Optional[int] = None
+) -> Dict[TableKey, int]:
+    """
+    Load archive files into the local store, parsing the files in parallel processes.
+
+    Rows already in the store win over archive rows for the same contract and date, so running
+    the import on a synced store only fills in missing history.
+
+    Returns:
+        Dict[TableKey, int]: Rows stored per (dataset, type) after the import.
+    """
+    imported: Dict[TableKey, List[pd.DataFrame]] = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for tables in pool.map(parse_report, paths, [contract_codes] * len(paths)):
+            for key, frame in tables.items():
+                imported.setdefault(key, []).append(frame)
+
+    counts = {}
+    for (dataset_code, type_category), frames in sorted(imported.items()):
+        path = store.path(dataset_code, type_category)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Same lock as CotStore.sync / verify_recent, so weeks synced meanwhile are not overwritten
+        with file_lock(path):
+            stored = store.load(dataset_code, type_category)
+            combined = normalize_table(pd.concat(frames + [stored], ignore_index=True))
+            store.write(dataset_code, type_category, combined)
+        counts[(dataset_code, type_category)] = len(combined)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed the local COT store from CFTC annual archive files.")
+    parser.add_argument("directory", help="Directory with the annual zips (fut_disagg_txt_*, com_disagg_txt_*, deacot*, deahistfo*)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Local store directory")
+    parser.add_argument("--only-registered", action="store_true", help="Only import contracts listed in instruments.json")
+    parser.add_argument("--workers", type=int, help="Parallel parser processes (default: CPU count)")
+    args = parser.parse_args()
+
+    paths = sorted(
+        path for pattern in ("*.zip", "*.txt", "*.csv")
+        for path in glob.glob(os.path.join(args.directory, pattern))
+    )
+    if not paths:
+        raise SystemExit(f"No archive files found in {args.directory}")
+
+    codes = list(InstrumentRegistry("instruments.json").load().values()) if args.only_registered else None
+    counts = import_archives(paths, CotStore(args.data_dir), codes, args.workers)
+    for (dataset_code, type_category), rows in counts.items():
+        print(f"{dataset_code} {type_category}: {rows} rows")
+
+
+if __name__ == "__main__":
+    main()
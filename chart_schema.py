@@ -0,0 +1,367 @@
+import warnings
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from correlation import POSITIONING_NETS
+from functions import apply_highlights_to_plot
+
+# Declarative chart layout per dataset.
+#
+# Net columns come from correlation.POSITIONING_NETS and are computed once per rerun.
+# charts: rendered in order; each has
+#     key            prefix of the widget keys
+#     title          subheader and figure title
+#     style          "switchable" (bar or line, per the chart type checkbox), "bar" (always grouped bars) or "line"
+#     bar_mode_choice  offer Grouped / Stacked bars
+#     series         checkbox label, column and optional color; columns missing from the data are skipped
+# Optional chart keys: legend_title, color_sequence, default_selected, help.
+DATASET_SCHEMAS: Dict[str, Dict] = {
+    "QDL/FON": {
+        "chart_type_toggle": True,
+        "charts": [
+            {
+                "key": "positions",
+                "title": "Participant Positions (Long & Short) by Participant Type",
+                "style": "switchable",
+                "bar_mode_choice": True,
+                "legend_title": "Participant Type",
+                "series": [
+                    {"column": "producer_merchant_processor_user_longs", "label": "Show Commercials Longs", "color": "red"},
+                    {"column": "swap_dealer_longs", "label": "Show Commercials Longs", "color": "red"},
+                    {"column": "money_manager_longs", "label": "Show Large Speculators Longs", "color": "blue"},
+                    {"column": "other_reportable_longs", "label": "Show Large Speculators Longs", "color": "blue"},
+                    {"column": "non_reportable_longs", "label": "Show Small Specs Longs", "color": "yellow"},
+                    {"column": "producer_merchant_processor_user_shorts", "label": "Show Commercials Shorts", "color": "red"},
+                    {"column": "swap_dealer_shorts", "label": "Show Commercials Shorts", "color": "red"},
+                    {"column": "money_manager_shorts", "label": "Show Large Speculators Shorts", "color": "blue"},
+                    {"column": "other_reportable_shorts", "label": "Show Large Speculators Shorts", "color": "blue"},
+                    {"column": "non_reportable_shorts", "label": "Show Small Specs Shorts", "color": "yellow"},
+                ],
+            },
+            {
+                "key": "spread",
+                "title": "Spreads by Participant Type",
+                "style": "switchable",
+                "legend_title": "Spread Type",
+                "color_sequence": px.colors.qualitative.Set3,
+                "series": [
+                    {"column": "swap_dealer_spreads", "label": "Show Swap Dealer Spreads"},
+                    {"column": "money_manager_spreads", "label": "Show Money Manager Spreads"},
+                    {"column": "other_reportable_spreads", "label": "Show Other Reportable Spreads"},
+                ],
+            },
+            {
+                "key": "net",
+                "title": "Net Positions by Participant Type",
+                "style": "bar",
+                "legend_title": "Net Type",
+                "series": [
+                    {"column": "commercials_net", "label": "Show Commercials Net", "color": "red"},
+                    {"column": "large_speculators_net", "label": "Show Large Speculators Net", "color": "blue"},
+                    {"column": "small_specs_net", "label": "Show Small Specs Net", "color": "yellow"},
+                ],
+            },
+        ],
+    },
+    "QDL/LFON": {
+        "chart_type_toggle": True,
+        "charts": [
+            {
+                "key": "positions",
+                "title": "Long & Short Positions by Participant Type",
+                "style": "switchable",
+                "bar_mode_choice": True,
+                "series": [
+                    {"column": "non_commercial_longs", "label": "Show Non Commercial Longs"},
+                    {"column": "commercial_longs", "label": "Show Commercial Longs"},
+                    {"column": "total_reportable_longs", "label": "Show Total Reportable Longs"},
+                    {"column": "non_reportable_longs", "label": "Show Non Reportable Longs"},
+                    {"column": "non_commercial_shorts", "label": "Show Non Commercial Shorts"},
+                    {"column": "commercial_shorts", "label": "Show Commercial Shorts"},
+                    {"column": "total_reportable_shorts", "label": "Show Total Reportable Shorts"},
+                    {"column": "non_reportable_shorts", "label": "Show Non Reportable Shorts"},
+                ],
+            },
+            {
+                "key": "spread",
+                "title": "Spread Positions by Participant Type",
+                "style": "switchable",
+                "series": [
+                    {"column": "non_commercial_spreads", "label": "Show Non Commercial Spreads"},
+                ],
+            },
+            {
+                "key": "net",
+                "title": "Net Positions by Participant Type",
+                "style": "bar",
+                "series": [
+                    {"column": "commercial_net", "label": "Show Commercials", "color": "red"},
+                    {"column": "non_commercial_net", "label": "Show Non Commercials Net", "color": "blue"},
+                    {"column": "non_reportables_net", "label": "Show Non Reportables", "color": "yellow"},
+                    {"column": "total_net", "label": "Show Total Net", "color": "green"},
+                ],
+            },
+            {
+                "key": "participation",
+                "title": "Market Participation Over Time",
+                "style": "line",
+                "series": [
+                    {"column": "market_participation", "label": "Show Market Participation"},
+                ],
+            },
+        ],
+    },
+    "QDL/FCR": {
+        "chart_type_toggle": False,
+        "charts": [
+            {
+                "key": "concentration",
+                "title": "Concentration Ratios: Largest Traders",
+                "style": "line",
+                "default_selected": True,
+                "help": "Displays data for the selected group of large traders.",
+                "series": [
+                    {"column": "largest_4_longs_gross", "label": "Show Top 4 Largest Traders (Gross Long Positions)"},
+                    {"column": "largest_4_shorts_gross", "label": "Show Top 4 Largest Traders (Gross Short Positions)"},
+                    {"column": "largest_8_longs_gross", "label": "Show Top 8 Largest Traders (Gross Long Positions)"},
+                    {"column": "largest_8_shorts_gross", "label": "Show Top 8 Largest Traders (Gross Short Positions)"},
+                    {"column": "largest_4_longs_net", "label": "Show Top 4 Largest Traders (Net Long Positions)"},
+                    {"column": "largest_4_shorts_net", "label": "Show Top 4 Largest Traders (Net Short Positions)"},
+                    {"column": "largest_8_longs_net", "label": "Show Top 8 Largest Traders (Net Long Positions)"},
+                    {"column": "largest_8_shorts_net", "label": "Show Top 8 Largest Traders (Net Short Positions)"},
+                ],
+            },
+        ],
+    },
+    "QDL/CITS": {
+        "chart_type_toggle": True,
+        "charts": [
+            {
+                "key": "positions",
+                "title": "Long & Short Positions by Trader Type",
+                "style": "switchable",
+                "bar_mode_choice": True,
+                "series": [
+                    {"column": "non_commercial_longs", "label": "Show Non Commercial Longs"},
+                    {"column": "commercial_longs", "label": "Show Commercial Longs"},
+                    {"column": "index_trader_longs", "label": "Show Index Trader Longs"},
+                    {"column": "non_reportable_longs", "label": "Show Non Reportable Longs"},
+                    {"column": "non_commercial_shorts", "label": "Show Non Commercial Shorts"},
+                    {"column": "commercial_shorts", "label": "Show Commercial Shorts"},
+                    {"column": "index_trader_shorts", "label": "Show Index Trader Shorts"},
+                    {"column": "non_reportable_shorts", "label": "Show Non Reportable Shorts"},
+                ],
+            },
+            {
+                "key": "spread",
+                "title": "Spread Positions by Trader Type",
+                "style": "switchable",
+                "series": [
+                    {"column": "non_commercial_spreads", "label": "Show Non Commercial Spreads"},
+                ],
+            },
+            {
+                "key": "net",
+                "title": "Net Positions by Trader Type",
+                "style": "bar",
+                "series": [
+                    {"column": "commercial_net", "label": "Show Commercials Net", "color": "red"},
+                    {"column": "non_commercial_net", "label": "Show Non Commercials Net", "color": "blue"},
+                    {"column": "index_trader_net", "label": "Show Index Traders Net", "color": "green"},
+                    {"column": "non_reportables_net", "label": "Show Non Reportables Net", "color": "yellow"},
+                ],
+            },
+            {
+                "key": "participation",
+                "title": "Market Participation Over Time",
+                "style": "line",
+                "series": [
+                    {"column": "market_participation", "label": "Show Market Participation"},
+                ],
+            },
+        ],
+    },
+}
+
+
+def add_net_columns(data: pd.DataFrame, nets: Dict[str, Tuple[List[str], List[str]]]) -> pd.DataFrame:
+    """
+    Add the derived net columns whose inputs are all present in `data`.
+
+    Args:
+        data (pd.DataFrame): Table returned by `get_table`.
+        nets (Dict[str, Tuple[List[str], List[str]]]): Net column -> (long columns, short columns).
+
+    Returns:
+        pd.DataFrame: `data` with the net columns added.
+    """
+    derived = {}
+    for net, (longs, shorts) in nets.items():
+        if all(col in data.columns for col in longs + shorts):
+            derived[net] = data[longs].sum(axis=1, min_count=len(longs)) - data[shorts].sum(axis=1, min_count=len(shorts))
+    return data.assign(**derived) if derived else data
+
+
+def column_bounds(data: pd.DataFrame, columns: List[str]) -> Dict[str, Tuple[float, float]]:
+    """
+    NaN-aware min and max of every column in one vectorized reduction over the block.
+
+    Returns:
+        Dict[str, Tuple[float, float]]: column -> (min, max); (nan, nan) for all-NaN columns.
+    """
+    if not columns:
+        return {}
+    values = data[columns].to_numpy(dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN columns
+        mins = np.nanmin(values, axis=0) if len(values) else np.full(len(columns), np.nan)
+        maxs = np.nanmax(values, axis=0) if len(values) else np.full(len(columns), np.nan)
+    return {col: (lo, hi) for col, lo, hi in zip(columns, mins, maxs)}
+
+
+def padded_range(lo: float, hi: float, padding: float = 0.1) -> Optional[List[float]]:
+    """Widen [lo, hi] outward by `padding` of each bound's magnitude; None if there is no data."""
+    if np.isnan(lo) or np.isnan(hi):
+        return None
+    return [lo - abs(lo) * padding, hi + abs(hi) * padding]
+
+
+def chart_range(data: pd.DataFrame, columns: List[str], bounds: Dict[str, Tuple[float, float]], stacked: bool) -> Optional[List[float]]:
+    """
+    Y-axis range for the selected series. Grouped bars and lines reuse the precomputed per-column
+    bounds; stacked bars need the extremes of the per-date positive and negative stacks.
+    """
+    if stacked:
+        values = data[columns].to_numpy(dtype=float)
+        lo = np.nanmin(np.where(values < 0, values, 0).sum(axis=1), initial=0.0)
+        hi = np.nanmax(np.where(values > 0, values, 0).sum(axis=1), initial=0.0)
+        return padded_range(lo, hi)
+    lows = [bounds[col][0] for col in columns]
+    highs = [bounds[col][1] for col in columns]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return padded_range(np.nanmin(lows), np.nanmax(highs))
+
+
+def build_chart(data: pd.DataFrame, chart: Dict, series: List[Dict], use_bar_charts: bool, bar_mode: str):
+    """
+    Build the Plotly figure for one chart spec and its selected series.
+
+    Args:
+        data (pd.DataFrame): Table with a 'date' column and the series columns.
+        chart (Dict): Chart spec from DATASET_SCHEMAS.
+        series (List[Dict]): Selected series specs.
+        use_bar_charts (bool): Chart type checkbox, used by "switchable" charts.
+        bar_mode (str): 'group' or 'stack'.
+    """
+    columns = [s["column"] for s in series]
+    frame = data[["date"] + columns]
+    colors = {}
+    if all("color" in s for s in series):
+        colors["color_discrete_map"] = {s["column"]: s["color"] for s in series}
+    elif "color_sequence" in chart:
+        colors["color_discrete_sequence"] = chart["color_sequence"]
+
+    as_bars = chart["style"] == "bar" or (chart["style"] == "switchable" and use_bar_charts)
+    if as_bars:
+        bar_mode = bar_mode if chart.get("bar_mode_choice") else "group"
+        fig = px.bar(frame, x="date", y=columns, title=chart["title"], barmode=bar_mode, **colors)
+        fig.update_traces(width=8)  # Fixed bar width for thicker bars
+        fig.update_layout(barmode=bar_mode, bargap=0.05)  # Fixed space between bars
+    else:
+        fig = px.line(frame, x="date", y=columns, title=chart["title"], **colors)
+
+    layout = dict(
+        xaxis_title="Date",
+        yaxis_title="Value",
+        legend=dict(orientation="h", y=-0.2),
+        height=600,  # Increase plot height for better visibility
+        width=1200   # Increase plot width for better readability
+    )
+    if "legend_title" in chart:
+        layout["legend_title_text"] = chart["legend_title"]
+    fig.update_layout(**layout)
+    return fig
+
+
+def render_percentile_ranks(percentile_ranks: pd.DataFrame, series: List[Dict]) -> None:
+    """Show where the latest value of each series sits in its history, per lookback window."""
+    # Indexed by column: several series share a checkbox label
+    columns = [s["column"] for s in series if s["column"] in percentile_ranks.index]
+    if not columns:
+        return
+    ranks = percentile_ranks.loc[columns]
+    st.caption("Percentile of the latest week within each lookback window (0 = lowest, 100 = highest)")
+    st.dataframe(ranks.style.format("{:.0f}", na_rep="-"))
+
+
+def render_dataset_charts(
+        data: pd.DataFrame,
+        dataset_code: str,
+        recurring_periods: List[Dict],
+        percentile_ranks: Optional[pd.DataFrame] = None
+) -> None:
+    """
+    Render the series checkboxes and charts of `dataset_code` as described by DATASET_SCHEMAS.
+
+    Net columns and per-column axis bounds are computed once and shared by every chart.
+
+    Args:
+        data (pd.DataFrame): Table returned by `get_table` with 'date' converted to datetime.
+        dataset_code (str): e.g. 'QDL/FON'.
+        recurring_periods (List[Dict]): Highlight periods passed to `apply_highlights_to_plot`.
+        percentile_ranks (Optional[pd.DataFrame]): Percentile rank of the latest value per column
+            (rows) and lookback window (columns), shown under each chart for its selected series.
+    """
+    schema = DATASET_SCHEMAS.get(dataset_code)
+    if schema is None:
+        st.info(f"No charts are defined for {dataset_code}.")
+        return
+
+    data = add_net_columns(data, POSITIONING_NETS.get(dataset_code, {}))
+    charts = []
+    for chart in schema["charts"]:
+        series = [s for s in chart["series"] if s["column"] in data.columns]
+        if series:
+            charts.append((chart, series))
+    chart_columns = list(dict.fromkeys(s["column"] for _, series in charts for s in series))
+    bounds = column_bounds(data, chart_columns)
+
+    use_bar_charts = False
+    if schema.get("chart_type_toggle"):
+        st.subheader("Chart Type Selection")
+        use_bar_charts = st.checkbox("Use Bar Charts (uncheck for Line Charts)", value=False)
+
+    for chart, series in charts:
+        st.subheader(chart["title"])
+
+        bar_mode = "group"
+        if chart.get("bar_mode_choice"):
+            choice = st.radio("Select Bar Mode", ["Grouped", "Stacked"], index=0, key=f"bar_mode_{chart['key']}")  # Default to Grouped
+            bar_mode = "group" if choice == "Grouped" else "stack"
+
+        # User selection of series - unique keys since labels can repeat
+        selected = [s for s in series if st.checkbox(
+            s["label"],
+            value=chart.get("default_selected", False),
+            key=f"{chart['key']}_{s['column']}",
+            help=chart.get("help")
+        )]
+        if not selected:
+            continue
+
+        fig = build_chart(data, chart, selected, use_bar_charts, bar_mode)
+        stacked = bar_mode == "stack" and chart.get("bar_mode_choice") and (chart["style"] == "bar" or use_bar_charts)
+        y_range = chart_range(data, [s["column"] for s in selected], bounds, stacked)
+        if y_range is not None:
+            fig.update_layout(yaxis_range=y_range)
+
+        apply_highlights_to_plot(fig, data, recurring_periods)
+        st.plotly_chart(fig, use_container_width=True)
+
+        if percentile_ranks is not None:
+            render_percentile_ranks(percentile_ranks, selected)
@@ -0,0 +1,116 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from chart_schema import add_net_columns
+from correlation import POSITIONING_NETS
+from cot_store import CotStore
+
+# Default lookback of the COT index (Williams): where the value sits within its trailing range
+COT_INDEX_WEEKS = 156
+
+
+def metric_columns(store: CotStore, dataset_code: str, type_category: str) -> List[str]:
+    """
+    Metrics that can be compared for a stored table: the registered net columns whose inputs are
+    stored, followed by every numeric stored column. Only the Parquet footer is read.
+    """
+    schema = pq.read_schema(store.path(dataset_code, type_category))
+    numeric = [
+        field.name for field in schema
+        if field.name not in ("contract_code", "date") and (pa.types.is_integer(field.type) or pa.types.is_floating(field.type))
+    ]
+    nets = POSITIONING_NETS.get(dataset_code, {})
+    derived = [net for net, (longs, shorts) in nets.items() if all(col in numeric for col in longs + shorts)]
+    return derived + numeric
+
+
+def load_metric(
+        store: CotStore,
+        dataset_code: str,
+        type_category: str,
+        metric: str,
+        contract_codes: Iterable[str],
+        start: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Load one metric for several contracts as a (date x contract_code) frame.
+
+    All contracts come from a single filtered scan of the stored table that reads only the
+    columns the metric needs, and are aligned by one pivot. The date axis is the union of
+    every contract's report dates; a contract without a report in some week gets NaN there.
+
+    Args:
+        store (CotStore): Local store.
+        dataset_code (str): e.g. 'QDL/FON'.
+        type_category (str): e.g. 'F_ALL'.
+        metric (str): A stored column or a net column of POSITIONING_NETS.
+        contract_codes (Iterable[str]): Contracts to compare.
+        start (Optional[str]): First date to keep (inclusive).
+
+    Returns:
+        pd.DataFrame: Metric values with one column per contract, in the order requested.
+    """
+    contract_codes = list(dict.fromkeys(contract_codes))
+    nets = POSITIONING_NETS.get(dataset_code, {})
+    if metric in nets:
+        longs, shorts = nets[metric]
+        frame = store.load(dataset_code, type_category, contract_codes=contract_codes, columns=longs + shorts, start=start)
+        frame = add_net_columns(frame, {metric: nets[metric]})
+    else:
+        frame = store.load(dataset_code, type_category, contract_codes=contract_codes, columns=[metric], start=start)
+
+    if frame.empty:
+        return pd.DataFrame(columns=contract_codes, dtype=float)
+    wide = frame.pivot(index="date", columns="contract_code", values=metric).astype(float).sort_index()
+    return wide.reindex(columns=[code for code in contract_codes if code in wide.columns])
+
+
+def fill_gaps(wide: pd.DataFrame, max_weeks: int) -> pd.DataFrame:
+    """Carry each contract's last value forward over at most `max_weeks` missing weeks."""
+    return wide.ffill(limit=max_weeks) if max_weeks > 0 else wide
+
+
+def cot_index(wide: pd.DataFrame, weeks: int = COT_INDEX_WEEKS) -> pd.DataFrame:
+    """
+    Normalize every column to 0-100 within its trailing `weeks` range, so contracts of very
+    different size share one axis. NaN while a contract has fewer than `weeks // 2` values
+    or its range is flat.
+    """
+    rolling = wide.rolling(weeks, min_periods=max(2, weeks // 2))
+    low = rolling.min()
+    high = rolling.max()
+    span = (high - low).replace(0, np.nan)
+    return (wide - low) / span * 100
+
+
+def overlay_figure(wide: pd.DataFrame, names: Dict[str, str], title: str, yaxis_title: str) -> go.Figure:
+    """
+    Overlay every column of `wide` as a WebGL line trace on the shared date axis.
+
+    Gaps (NaN) are left as breaks in the line instead of being interpolated.
+    """
+    fig = go.Figure()
+    dates = wide.index
+    for code in wide.columns:
+        fig.add_trace(go.Scattergl(
+            x=dates,
+            y=wide[code].to_numpy(),
+            mode="lines",
+            name=names.get(code, code),
+            connectgaps=False
+        ))
+    fig.update_layout(
+        title=title,
+        xaxis_title="Date",
+        yaxis_title=yaxis_title,
+        hovermode="x unified",
+        legend=dict(orientation="h", y=-0.2),
+        height=600,
+        width=1200
+    )
+    return fig
@@ -0,0 +1,155 @@
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Net positioning per participant group: (long columns, short columns).
+# The single registry of net formulas, shared by the monitor charts, the comparison and
+# percentile views, correlations, alerts and exports. Nets whose columns are missing from a
+# table are skipped where tables are rendered or exported.
+POSITIONING_NETS: Dict[str, Dict[str, Tuple[List[str], List[str]]]] = {
+    "QDL/FON": {
+        "money_manager_net": (["money_manager_longs"], ["money_manager_shorts"]),
+        "commercials_net": (
+            ["producer_merchant_processor_user_longs", "swap_dealer_longs"],
+            ["producer_merchant_processor_user_shorts", "swap_dealer_shorts"]
+        ),
+        "large_speculators_net": (
+            ["money_manager_longs", "other_reportable_longs"],
+            ["money_manager_shorts", "other_reportable_shorts"]
+        ),
+        "small_specs_net": (["non_reportable_longs"], ["non_reportable_shorts"]),
+    },
+    "QDL/LFON": {
+        "non_commercial_net": (["non_commercial_longs"], ["non_commercial_shorts"]),
+        "commercial_net": (["commercial_longs"], ["commercial_shorts"]),
+        "non_reportables_net": (["non_reportable_longs"], ["non_reportable_shorts"]),
+        "total_net": (["total_reportable_longs"], ["total_reportable_shorts"]),
+    },
+    "QDL/CITS": {
+        "commercial_net": (["commercial_longs"], ["commercial_shorts"]),
+        "non_commercial_net": (["non_commercial_longs"], ["non_commercial_shorts"]),
+        "index_trader_net": (["index_trader_longs"], ["index_trader_shorts"]),
+        "non_reportables_net": (["non_reportable_longs"], ["non_reportable_shorts"]),
+    },
+}
+
+# Total open interest is reported as market_participation in both FON and LFON
+OPEN_INTEREST_COLUMN = "market_participation"
+
+
+def metric_values(frame: pd.DataFrame, dataset_code: str, metric: str) -> pd.Series:
+    """
+    Compute a positioning metric for every row of a long-format COT table.
+
+    Args:
+        frame (pd.DataFrame): Rows as returned by `get_table` / `CotStore.load`.
+        dataset_code (str): 'QDL/FON' or 'QDL/LFON'.
+        metric (str): A key of `POSITIONING_NETS[dataset_code]` or `OPEN_INTEREST_COLUMN`.
+
+    Returns:
+        pd.Series: Metric value per row.
+    """
+    if metric == OPEN_INTEREST_COLUMN:
+        return frame[OPEN_INTEREST_COLUMN].astype(float)
+    longs, shorts = POSITIONING_NETS[dataset_code][metric]
+    return frame[longs].sum(axis=1, min_count=len(longs)) - frame[shorts].sum(axis=1, min_count=len(shorts))
+
+
+def weekly_changes(frame: pd.DataFrame, dataset_code: str, metric: str) -> pd.DataFrame:
+    """
+    Pivot a metric into a (date x contract_code) frame of week-over-week changes.
+
+    A contract with a missing week gets NaN for the weeks around the gap rather than a
+    change spanning two weeks.
+    """
+    values = frame[["date", "contract_code"]].assign(value=metric_values(frame, dataset_code, metric).values)
+    wide = values.pivot(index="date", columns="contract_code", values="value").sort_index()
+    return wide.diff()
+
+
+class RollingCorrelation:
+    """
+    Rolling-window pairwise correlation matrix maintained one week at a time.
+
+    The window keeps running sums over pairwise-complete observations (count, sum, sum of
+    squares and cross products, each K x K), so adding a week and dropping the oldest one
+    costs O(K^2) instead of recomputing the whole matrix over the window.
+    """
+
+    def __init__(self, columns: List[str], window: int, min_periods: Optional[int] = None):
+        self.columns = list(columns)
+        self.window = window
+        self.min_periods = min_periods if min_periods is not None else max(2, window // 2)
+        self.last_date = None
+
+        k = len(self.columns)
+        self._rows = deque()
+        self._n = np.zeros((k, k))
+        self._sx = np.zeros((k, k))
+        self._sxx = np.zeros((k, k))
+        self._sxy = np.zeros((k, k))
+
+    def _accumulate(self, x: np.ndarray, mask: np.ndarray, sign: float) -> None:
+        self._n += sign * np.outer(mask, mask)
+        self._sx += sign * np.outer(x, mask)
+        self._sxx += sign * np.outer(x * x, mask)
+        self._sxy += sign * np.outer(x, x)
+
+    def update(self, row: np.ndarray, date=None) -> None:
+        """
+        Add one week of observations (NaN where an instrument has no value) and drop the
+        week that falls out of the window.
+        """
+        row = np.asarray(row, dtype=float)
+        mask = (~np.isnan(row)).astype(float)
+        x = np.where(mask > 0, row, 0.0)
+
+        self._rows.append((date, x, mask))
+        self._accumulate(x, mask, 1.0)
+        if len(self._rows) > self.window:
+            _, old_x, old_mask = self._rows.popleft()
+            self._accumulate(old_x, old_mask, -1.0)
+        self.last_date = date
+
+    def update_frame(self, frame: pd.DataFrame) -> None:
+        """Feed every row of a (date x column) frame whose date is after `last_date`."""
+        if self.last_date is not None:
+            frame = frame[frame.index > self.last_date]
+        values = frame[self.columns].to_numpy(dtype=float)
+        for date, row in zip(frame.index, values):
+            self.update(row, date)
+
+    def matches(self, frame: pd.DataFrame) -> bool:
+        """
+        Whether the weeks currently in the window still hold the same values in `frame`.
+        False after a revision of past weeks, in which case the engine should be rebuilt.
+        """
+        dates = [date for date, _, _ in self._rows]
+        if not dates or frame.index.isin(dates).sum() != len(dates):
+            return False
+        values = frame.loc[dates, self.columns].to_numpy(dtype=float)
+        stored = np.array([np.where(mask > 0, x, np.nan) for _, x, mask in self._rows])
+        return bool(np.array_equal(values, stored, equal_nan=True))
+
+    def corr(self) -> pd.DataFrame:
+        """Return the correlation matrix of the current window (NaN below `min_periods`)."""
+        n = self._n
+        sx = self._sx
+        sy = self._sx.T
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = n * self._sxy - sx * sy
+            var_x = n * self._sxx - sx * sx
+            var_y = n * self._sxx.T - sy * sy
+            result = cov / np.sqrt(var_x * var_y)
+        result[(n < self.min_periods) | (var_x <= 0) | (var_y <= 0)] = np.nan
+        np.clip(result, -1.0, 1.0, out=result)
+        return pd.DataFrame(result, index=self.columns, columns=self.columns)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, window: int, min_periods: Optional[int] = None) -> "RollingCorrelation":
+        """Build the window state by replaying the last `window` rows of a (date x column) frame."""
+        engine = cls(list(frame.columns), window, min_periods)
+        engine.update_frame(frame.iloc[-window:])
+        return engine
@@ -6,6 +6,7 @@ import toml
 import json
 import pandas as pd
 from functions import generate_highlight_ranges, apply_highlights_to_plot  # Ensure this import exists
+from instrument_registry import InstrumentRegistry, load_instrument_mapping
 
 # Page configuration
 st.set_page_config(page_title="CFTC Monitor", layout="wide")
@@ -29,9 +30,13 @@ if not os.path.exists(instrument_mapping_file):
     st.error("instruments.json file not found. Please ensure the file exists in the app directory with the instrument mappings.")
     st.stop()  # Stop execution if the file doesn’t exist
 
+instrument_registry = InstrumentRegistry(instrument_mapping_file)
+
 try:
-    with open(instrument_mapping_file, "r") as f:
-        st.session_state.instrument_mapping = json.load(f)
+    registry_version = instrument_registry.version()
+    if st.session_state.get("instrument_mapping_version") != registry_version:
+        st.session_state.instrument_mapping = load_instrument_mapping(instrument_mapping_file, registry_version)
+        st.session_state.instrument_mapping_version = registry_version
 except json.JSONDecodeError as e:
     st.error(f"Error decoding instruments.json: {e}")
     st.stop()  # Stop execution if the JSON is invalid
@@ -125,13 +130,14 @@ new_instrument_code = st.text_input("Enter Instrument Code", placeholder="e.g.,
 
 if st.button("Add Instrument"):
     if new_instrument_name and new_instrument_code:
-        st.session_state.instrument_mapping[new_instrument_name] = new_instrument_code
-        # Save updated mapping to file
         try:
-            with open(instrument_mapping_file, "w") as f:
-                json.dump(st.session_state.instrument_mapping, f, indent=4)
-            st.success(f"Added: {new_instrument_name} ({new_instrument_code})")
-            st.experimental_rerun()  # Refresh the app to update the selectbox and removal options
+            if instrument_registry.find_unknown_codes([new_instrument_code]):
+                st.error(f"Instrument code {new_instrument_code} has no report in QDL/FON or QDL/LFON within the last year.")
+            else:
+                # Locked read-modify-write so concurrent edits from other sessions are not lost
+                instrument_registry.add(new_instrument_name, new_instrument_code)
+                st.success(f"Added: {new_instrument_name} ({new_instrument_code})")
+                st.rerun()  # Refresh the app to update the selectbox and removal options
         except Exception as e:
             st.error(f"Error saving instruments.json: {e}")
     else:
@@ -145,18 +151,31 @@ if st.button("Remove Instrument"):
         if instrument_to_remove == selected_instrument:
             st.warning("Cannot remove the currently selected instrument. Please select a different instrument first.")
         else:
-            del st.session_state.instrument_mapping[instrument_to_remove]
-            # Save updated mapping to file
             try:
-                with open(instrument_mapping_file, "w") as f:
-                    json.dump(st.session_state.instrument_mapping, f, indent=4)
+                instrument_registry.remove(instrument_to_remove)
                 st.success(f"Removed: {instrument_to_remove}")
-                st.experimental_rerun()  # Refresh the app to update the selectbox and removal options
+                st.rerun()  # Refresh the app to update the selectbox and removal options
+            except KeyError:
+                st.warning(f"{instrument_to_remove} was already removed in another session.")
+                st.rerun()
             except Exception as e:
                 st.error(f"Error saving instruments.json: {e}")
     else:
         st.warning("Please select an instrument to remove.")
 
+# Check every registered code against the data source in one bulk request
+st.write("#### Validate Instruments")
+if st.button("Validate All Instrument Codes"):
+    try:
+        unknown_codes = instrument_registry.find_unknown_codes(st.session_state.instrument_mapping.values())
+        if unknown_codes:
+            unknown_names = [name for name, code in st.session_state.instrument_mapping.items() if code in unknown_codes]
+            st.warning(f"Codes without a report in the last year: {', '.join(f'{name} ({st.session_state.instrument_mapping[name]})' for name in unknown_names)}")
+        else:
+            st.success("All instrument codes were found at the data source.")
+    except Exception as e:
+        st.error(f"Error validating instrument codes: {e}")
+
 # Update session state with the selected instrument
 st.session_state.instrument_code = instrument_code
 st.session_state.selected_instrument = selected_instrument
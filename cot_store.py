@@ -0,0 +1,326 @@
+import io
+import os
+import json
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import data_source
+from file_utils import atomic_write, file_lock
+
+DATA_DIR = "data"
+
+StoreVersion = Tuple[int, int, int]
+BlockHashes = Dict[str, Dict[str, str]]
+
+
+class CotStore:
+    """
+    Local copy of the Nasdaq Data Link COT tables.
+
+    Each (dataset, type & category) pair is one Parquet file holding every stored contract
+    in the long format returned by `nasdaqdatalink.get_table`, sorted by contract_code and date,
+    e.g. data/QDL_FON/F_ALL.parquet.
+
+    Next to it, a manifest (F_ALL.manifest.json) holds a content hash per (contract, year) block
+    and a fingerprint of the whole table, which changes only when the data itself changes.
+    """
+
+    def __init__(self, root: str = DATA_DIR):
+        self.root = root
+
+    def path(self, dataset_code: str, type_category: str) -> str:
+        return os.path.join(self.root, dataset_code.replace("/", "_"), f"{type_category}.parquet")
+
+    def manifest_path(self, dataset_code: str, type_category: str) -> str:
+        return self.path(dataset_code, type_category)[:-len(".parquet")] + ".manifest.json"
+
+    def exists(self, dataset_code: str, type_category: str) -> bool:
+        return os.path.exists(self.path(dataset_code, type_category))
+
+    def tables(self) -> List[Tuple[str, str]]:
+        """Return every stored (dataset_code, type_category) pair."""
+        if not os.path.isdir(self.root):
+            return []
+        tables = []
+        for dataset_dir in sorted(os.listdir(self.root)):
+            dataset_path = os.path.join(self.root, dataset_dir)
+            if not os.path.isdir(dataset_path):
+                continue
+            for file_name in sorted(os.listdir(dataset_path)):
+                if file_name.endswith(".parquet"):
+                    tables.append((dataset_dir.replace("_", "/", 1), file_name[:-len(".parquet")]))
+        return tables
+
+    def version(self, dataset_code: str, type_category: str) -> Optional[StoreVersion]:
+        """
+        Return a token that changes whenever the table is rewritten, or None if it is not stored.
+        Intended as a cache key for anything derived from the table.
+        """
+        try:
+            stat = os.stat(self.path(dataset_code, type_category))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def manifest(self, dataset_code: str, type_category: str) -> Dict:
+        """
+        Return {'fingerprint': str, 'blocks': {contract_code: {year: hash}}} for a stored table.
+        Tables written before manifests existed are hashed on the fly.
+        """
+        manifest_path = self.manifest_path(dataset_code, type_category)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "r") as f:
+                return json.load(f)
+        return build_manifest(self.load(dataset_code, type_category))
+
+    def fingerprint(self, dataset_code: str, type_category: str) -> Optional[str]:
+        """
+        Content fingerprint of a stored table, or None if it is not stored.
+
+        Unlike `version`, it only changes when stored values change, so caches of figures and
+        derived metrics keyed on it are invalidated exactly when needed.
+        """
+        if not self.exists(dataset_code, type_category):
+            return None
+        return self.manifest(dataset_code, type_category)["fingerprint"]
+
+    def load(
+            self,
+            dataset_code: str,
+            type_category: str,
+            contract_codes: Optional[Iterable[str]] = None,
+            columns: Optional[List[str]] = None,
+            start: Optional[str] = None,
+            end: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Read a stored table, optionally restricted to some contracts, columns and a date range.
+
+        Args:
+            dataset_code (str): e.g. 'QDL/FON'.
+            type_category (str): e.g. 'F_ALL'.
+            contract_codes (Optional[Iterable[str]]): Contracts to keep. Defaults to all.
+            columns (Optional[List[str]]): Value columns to read; contract_code and date are always included.
+            start (Optional[str]): First date to keep (inclusive).
+            end (Optional[str]): Last date to keep (inclusive).
+
+        Returns:
+            pd.DataFrame: Matching rows, empty if the table is not stored.
+        """
+        path = self.path(dataset_code, type_category)
+        if not os.path.exists(path):
+            return pd.DataFrame(columns=["contract_code", "date"] + (columns or []))
+
+        if columns is not None:
+            columns = ["contract_code", "date"] + [col for col in columns if col not in ("contract_code", "date")]
+
+        filters = []
+        if contract_codes is not None:
+            filters.append(("contract_code", "in", list(contract_codes)))
+        if start is not None:
+            filters.append(("date", ">=", pd.Timestamp(start)))
+        if end is not None:
+            filters.append(("date", "<=", pd.Timestamp(end)))
+
+        return pd.read_parquet(path, columns=columns, filters=filters or None)
+
+    def last_dates(self, dataset_code: str, type_category: str) -> Dict[str, pd.Timestamp]:
+        """Return the latest stored date per contract code."""
+        stored = self.load(dataset_code, type_category, columns=[])
+        if stored.empty:
+            return {}
+        return stored.groupby("contract_code")["date"].max().to_dict()
+
+    def write(self, dataset_code: str, type_category: str, frame: pd.DataFrame) -> None:
+        """
+        Replace a stored table atomically and refresh its manifest.
+        Rows are normalized, de-duplicated and sorted first.
+        """
+        frame = normalize_table(frame)
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+        atomic_write(self.path(dataset_code, type_category), buffer.getvalue())
+        atomic_write(self.manifest_path(dataset_code, type_category), json.dumps(build_manifest(frame)))
+
+    def sync(self, dataset_code: str, type_category: str, contract_codes: Iterable[str]) -> pd.DataFrame:
+        """
+        Bring a stored table up to date with the data source.
+
+        Contracts that are already stored are grouped by their last stored date and each group
+        is fetched in one request for the weeks after that date, so a stale or delisted contract
+        does not make every other contract re-download its history. Usually all contracts share
+        the latest report and this is a single request. Contracts that are not stored yet are
+        fetched in full with one more request.
+
+        Args:
+            dataset_code (str): e.g. 'QDL/FON'.
+            type_category (str): e.g. 'F_ALL'.
+            contract_codes (Iterable[str]): Contracts that should be stored.
+
+        Returns:
+            pd.DataFrame: Rows that were not stored before (new weeks and new contracts).
+        """
+        contract_codes = sorted(set(contract_codes))
+        path = self.path(dataset_code, type_category)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with file_lock(path):
+            stored = self.load(dataset_code, type_category)
+            last_dates = stored.groupby("contract_code")["date"].max().to_dict() if not stored.empty else {}
+
+            known_codes = [code for code in contract_codes if code in last_dates]
+            new_codes = [code for code in contract_codes if code not in last_dates]
+
+            groups: Dict[pd.Timestamp, List[str]] = {}
+            for code in known_codes:
+                groups.setdefault(last_dates[code], []).append(code)
+
+            fetched = []
+            for since, codes in sorted(groups.items()):
+                fetched.append(data_source.get_table(
+                    dataset_code,
+                    contract_code=codes,
+                    type=type_category,
+                    date={"gt": since.strftime("%Y-%m-%d")},
+                    paginate=True
+                ))
+            if new_codes:
+                fetched.append(data_source.get_table(
+                    dataset_code,
+                    contract_code=new_codes,
+                    type=type_category,
+                    paginate=True
+                ))
+
+            fetched = [normalize_table(frame) for frame in fetched if not frame.empty]
+            if not fetched:
+                return stored.iloc[0:0]
+
+            incoming = pd.concat(fetched, ignore_index=True)
+            if not stored.empty:
+                existing_keys = pd.MultiIndex.from_frame(stored[["contract_code", "date"]])
+                incoming_keys = pd.MultiIndex.from_frame(incoming[["contract_code", "date"]])
+                new_rows = incoming[~incoming_keys.isin(existing_keys)]
+            else:
+                new_rows = incoming
+
+            if not new_rows.empty:
+                self.write(dataset_code, type_category, pd.concat([stored, new_rows], ignore_index=True))
+            return new_rows.reset_index(drop=True)
+
+
+    def verify_recent(
+            self,
+            dataset_code: str,
+            type_category: str,
+            contract_codes: Optional[Iterable[str]] = None,
+            years: int = 2
+    ) -> List[Tuple[str, str]]:
+        """
+        Detect and apply revisions to recent weeks.
+
+        The last `years` calendar years are re-requested in one call and hashed per
+        (contract, year) block. Only blocks whose hash differs from the manifest are replaced,
+        and nothing is written when every hash matches. Whole calendar years are fetched so that
+        block hashes are comparable.
+
+        Args:
+            dataset_code (str): e.g. 'QDL/FON'.
+            type_category (str): e.g. 'F_ALL'.
+            contract_codes (Optional[Iterable[str]]): Contracts to verify. Defaults to all stored.
+            years (int): Number of calendar years to verify, including the current one.
+
+        Returns:
+            List[Tuple[str, str]]: (contract_code, year) blocks that were rewritten, including
+            blocks that only gained new weeks.
+        """
+        path = self.path(dataset_code, type_category)
+        if not os.path.exists(path):
+            return []
+
+        with file_lock(path):
+            stored = self.load(dataset_code, type_category)
+            if contract_codes is None:
+                contract_codes = stored["contract_code"].unique()
+            contract_codes = sorted(set(contract_codes))
+            if not contract_codes:
+                return []
+
+            first_year = pd.Timestamp.today().year - years + 1
+            fetched = data_source.get_table(
+                dataset_code,
+                contract_code=contract_codes,
+                type=type_category,
+                date={"gte": f"{first_year}-01-01"},
+                paginate=True
+            )
+            if fetched.empty:
+                return []
+            fetched = normalize_table(fetched)
+
+            stored_blocks = self.manifest(dataset_code, type_category)["blocks"]
+            changed = [
+                (code, year)
+                for code, year_hashes in block_hashes(fetched).items()
+                for year, digest in year_hashes.items()
+                if stored_blocks.get(code, {}).get(year) != digest
+            ]
+            if not changed:
+                return []
+
+            changed_blocks = pd.MultiIndex.from_tuples(changed)
+            stored_keys = pd.MultiIndex.from_arrays([stored["contract_code"], stored["date"].dt.year.astype(str)])
+            fetched_keys = pd.MultiIndex.from_arrays([fetched["contract_code"], fetched["date"].dt.year.astype(str)])
+            self.write(dataset_code, type_category, pd.concat(
+                [stored[~stored_keys.isin(changed_blocks)], fetched[fetched_keys.isin(changed_blocks)]],
+                ignore_index=True
+            ))
+            return changed
+
+
+def block_hashes(frame: pd.DataFrame) -> BlockHashes:
+    """
+    Content hash of every (contract_code, calendar year) block of a normalized table.
+
+    Values are hashed as float64 and dates as datetime64[ns], so the same data hashes the same
+    whether it comes from the API or from Parquet. The 'type' column is ignored.
+    """
+    if frame.empty:
+        return {}
+    value_columns = sorted(col for col in frame.columns if col not in ("contract_code", "date", "type"))
+    hashed = pd.DataFrame({"date": frame["date"].astype("datetime64[ns]")})
+    for col in value_columns:
+        if pd.api.types.is_numeric_dtype(frame[col]):
+            hashed[col] = frame[col].astype("float64")
+        else:
+            hashed[col] = frame[col].astype(str).astype(object)
+    row_hashes = pd.util.hash_pandas_object(hashed, index=False).to_numpy()
+    header = ",".join(value_columns).encode("utf-8")
+
+    blocks: BlockHashes = {}
+    groups = frame.groupby([frame["contract_code"], frame["date"].dt.year], sort=True).indices
+    for (code, year), rows in groups.items():
+        digest = hashlib.sha256(header + row_hashes[rows].tobytes()).hexdigest()[:16]
+        blocks.setdefault(code, {})[str(year)] = digest
+    return blocks
+
+
+def build_manifest(frame: pd.DataFrame) -> Dict:
+    """Block hashes of a normalized table plus a fingerprint over all of them."""
+    blocks = block_hashes(frame)
+    fingerprint = hashlib.sha256(json.dumps(blocks, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return {"fingerprint": fingerprint, "blocks": blocks}
+
+
+def normalize_table(frame: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring a `get_table` result into the store layout: string contract codes, datetime dates,
+    one row per (contract_code, date) and sorted by both.
+    """
+    frame = frame.copy()
+    frame["contract_code"] = frame["contract_code"].astype(str)
+    frame["date"] = pd.to_datetime(frame["date"])
+    frame = frame.drop_duplicates(subset=["contract_code", "date"], keep="last")
+    return frame.sort_values(["contract_code", "date"]).reset_index(drop=True)
@@ -0,0 +1,84 @@
+import os
+import threading
+from typing import Dict, Optional
+
+import nasdaqdatalink
+import pandas as pd
+
+# Set COT_OFFLINE=1 to serve every table from the local store instead of Nasdaq Data Link
+# (load tests, demos, working without network access)
+OFFLINE_ENV = "COT_OFFLINE"
+OFFLINE_DATA_DIR_ENV = "COT_DATA_DIR"
+# Set COT_HTTP_TRANSPORT=nasdaqdatalink to fetch through the stock client instead of the pooled transport
+TRANSPORT_ENV = "COT_HTTP_TRANSPORT"
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def is_offline() -> bool:
+    return os.environ.get(OFFLINE_ENV, "").lower() in ("1", "true", "yes")
+
+
+def transport():
+    """The process-wide `PooledTransport`; its `metrics` and `summary()` cover every online fetch."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            from http_transport import PooledTransport
+            _transport = PooledTransport()
+        return _transport
+
+
+def get_table(dataset_code: str, **filters) -> pd.DataFrame:
+    """
+    Drop-in replacement for `nasdaqdatalink.get_table` used by the app.
+
+    Online it fetches from Nasdaq Data Link through the pooled transport. Offline it answers
+    the same filters (contract_code, type, date, qopts columns) from the local store.
+    """
+    if is_offline():
+        return _get_table_offline(dataset_code, **filters)
+    if os.environ.get(TRANSPORT_ENV, "").lower() == "nasdaqdatalink":
+        return nasdaqdatalink.get_table(dataset_code, **filters)
+    return transport().get_table(dataset_code, **filters)
+
+
+def _get_table_offline(
+        dataset_code: str,
+        contract_code=None,
+        type: Optional[str] = None,
+        date: Optional[Dict[str, str]] = None,
+        qopts: Optional[Dict] = None,
+        paginate: bool = False
+) -> pd.DataFrame:
+    from cot_store import CotStore, DATA_DIR  # Imported here: cot_store fetches through this module
+
+    store = CotStore(os.environ.get(OFFLINE_DATA_DIR_ENV, DATA_DIR))
+    if isinstance(contract_code, str):
+        contract_code = [contract_code]
+
+    type_categories = [type] if type else [t for d, t in store.tables() if d == dataset_code]
+    start = end = None
+    date = date or {}
+    if "gte" in date:
+        start = date["gte"]
+    if "gt" in date:
+        start = pd.Timestamp(date["gt"]) + pd.Timedelta(days=1)
+    if "lte" in date:
+        end = date["lte"]
+    if "lt" in date:
+        end = pd.Timestamp(date["lt"]) - pd.Timedelta(days=1)
+
+    frames = []
+    for type_category in type_categories:
+        frame = store.load(dataset_code, type_category, contract_codes=contract_code, start=start, end=end)
+        if "type" not in frame.columns:
+            frame.insert(1, "type", type_category)
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["contract_code", "type", "date"])
+
+    result = pd.concat(frames, ignore_index=True)
+    columns = (qopts or {}).get("columns")
+    return result[columns] if columns else result
@@ -0,0 +1,272 @@
+import json
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from correlation import POSITIONING_NETS
+from cot_store import CotStore, DATA_DIR
+
+EXPORT_FORMATS = ("arrow", "parquet")
+DEFAULT_BATCH_SIZE = 64 * 1024
+
+
+class ExportQuery:
+    """
+    What to export from one stored table.
+
+    Args:
+        dataset_code (str): e.g. 'QDL/FON'.
+        type_category (str): e.g. 'F_ALL'.
+        columns (Optional[List[str]]): Stored columns to include (contract_code and date always are). Defaults to all.
+        contract_codes (Optional[List[str]]): Contracts to include. Defaults to all.
+        start (Optional[str]): First date (inclusive).
+        end (Optional[str]): Last date (inclusive).
+        nets (bool): Append the derived net columns of POSITIONING_NETS for the dataset whose inputs are stored.
+    """
+
+    def __init__(
+            self,
+            dataset_code: str,
+            type_category: str,
+            columns: Optional[List[str]] = None,
+            contract_codes: Optional[List[str]] = None,
+            start: Optional[str] = None,
+            end: Optional[str] = None,
+            nets: bool = False
+    ):
+        self.dataset_code = dataset_code
+        self.type_category = type_category
+        self.columns = columns
+        self.contract_codes = contract_codes
+        self.start = start
+        self.end = end
+        self.nets = POSITIONING_NETS.get(dataset_code, {}) if nets else {}
+
+
+def _scanner(store: CotStore, query: ExportQuery, batch_size: int) -> ds.Scanner:
+    # Only stored tables: dataset and type come from HTTP query parameters and end up in a path
+    if (query.dataset_code, query.type_category) not in store.tables():
+        raise FileNotFoundError(f"No stored table {query.dataset_code} {query.type_category}")
+    path = store.path(query.dataset_code, query.type_category)
+    dataset = ds.dataset(path, format="parquet")
+
+    # Nets whose input columns this table does not have are left out, as on the monitor page
+    query.nets = {
+        net: (longs, shorts) for net, (longs, shorts) in query.nets.items()
+        if all(col in dataset.schema.names for col in longs + shorts)
+    }
+
+    columns = None
+    if query.columns is not None or query.nets:
+        wanted = ["contract_code", "date"] + (query.columns if query.columns is not None else [
+            name for name in dataset.schema.names if name not in ("contract_code", "date")
+        ])
+        for longs, shorts in query.nets.values():
+            wanted += longs + shorts
+        columns = list(dict.fromkeys(wanted))
+        unknown = [col for col in columns if col not in dataset.schema.names]
+        if unknown:
+            raise ValueError(f"Unknown columns for {query.dataset_code} {query.type_category}: {', '.join(unknown)}")
+
+    condition = None
+    if query.contract_codes:
+        condition = ds.field("contract_code").isin(query.contract_codes)
+    for op, bound in (("ge", query.start), ("le", query.end)):
+        if bound is None:
+            continue
+        timestamp = pa.scalar(pd.Timestamp(bound), type=dataset.schema.field("date").type)
+        clause = ds.field("date") >= timestamp if op == "ge" else ds.field("date") <= timestamp
+        condition = clause if condition is None else condition & clause
+
+    return dataset.scanner(columns=columns, filter=condition, batch_size=batch_size)
+
+
+def _add_nets(batch: pa.RecordBatch, query: ExportQuery, output_names: List[str]) -> pa.RecordBatch:
+    arrays = {name: batch.column(name) for name in batch.schema.names}
+    for net, (longs, shorts) in query.nets.items():
+        total = pc.cast(arrays[longs[0]], pa.float64())
+        for col in longs[1:]:
+            total = pc.add(total, pc.cast(arrays[col], pa.float64()))
+        for col in shorts:
+            total = pc.subtract(total, pc.cast(arrays[col], pa.float64()))
+        arrays[net] = total
+    return pa.RecordBatch.from_arrays([arrays[name] for name in output_names], names=output_names)
+
+
+def iter_batches(store: CotStore, query: ExportQuery, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """
+    Stream the matching rows as Arrow record batches.
+
+    Column projection and the contract/date filters are pushed down into the Parquet scan, so
+    only the requested data is read and at most one batch is held in memory at a time.
+
+    Raises:
+        FileNotFoundError: If the table is not stored.
+        ValueError: If a requested column does not exist.
+    """
+    if not store.exists(query.dataset_code, query.type_category):
+        raise FileNotFoundError(f"{query.dataset_code} {query.type_category} is not in the local store")
+
+    scanner = _scanner(store, query, batch_size)
+    if query.columns is not None:
+        output_names = list(dict.fromkeys(["contract_code", "date"] + query.columns))
+    else:
+        output_names = [name for name in scanner.projected_schema.names]
+    output_names += list(query.nets)
+
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield _add_nets(batch, query, output_names)
+
+
+def export_schema(store: CotStore, query: ExportQuery) -> pa.Schema:
+    """Schema of the batches `iter_batches` yields for `query`."""
+    projected = _scanner(store, query, DEFAULT_BATCH_SIZE).projected_schema
+    names = list(dict.fromkeys(["contract_code", "date"] + query.columns)) if query.columns is not None else projected.names
+    fields = [projected.field(name) for name in names]
+    fields += [pa.field(net, pa.float64()) for net in query.nets]
+    return pa.schema(fields)
+
+
+def write_export(store: CotStore, query: ExportQuery, sink, export_format: str = "arrow") -> int:
+    """
+    Write the export to a file path or writable file object as an Arrow IPC stream or Parquet,
+    one record batch at a time.
+
+    Returns:
+        int: Number of rows written.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {export_format}, expected one of {', '.join(EXPORT_FORMATS)}")
+
+    schema = export_schema(store, query)
+    rows = 0
+    if export_format == "arrow":
+        with pa.ipc.new_stream(sink, schema) as writer:
+            for batch in iter_batches(store, query):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    else:
+        with pq.ParquetWriter(sink, schema) as writer:
+            for batch in iter_batches(store, query):
+                writer.write_batch(batch)
+                rows += batch.num_rows
+    return rows
+
+
+def make_handler(store: CotStore):
+    """Build an HTTP handler class serving `store`."""
+
+    class ExportHandler(BaseHTTPRequestHandler):
+        """
+        GET /tables                 -> JSON list of stored (dataset, type) tables
+        GET /export?dataset=QDL/FON&type=F_ALL[&columns=a,b][&codes=x,y][&start=YYYY-MM-DD][&end=YYYY-MM-DD]
+                    [&nets=1][&format=arrow|parquet]
+                                    -> Arrow IPC stream or Parquet file, streamed batch by batch
+        """
+
+        def _send_json(self, status: int, payload) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            url = urlparse(self.path)
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+            if url.path == "/tables":
+                self._send_json(200, [{"dataset": dataset, "type": type_category} for dataset, type_category in store.tables()])
+                return
+            if url.path != "/export":
+                self._send_json(404, {"error": f"Unknown path {url.path}"})
+                return
+
+            if "dataset" not in params or "type" not in params:
+                self._send_json(400, {"error": "'dataset' and 'type' are required"})
+                return
+            export_format = params.get("format", "arrow")
+            query = ExportQuery(
+                params["dataset"],
+                params["type"],
+                columns=params["columns"].split(",") if params.get("columns") else None,
+                contract_codes=params["codes"].split(",") if params.get("codes") else None,
+                start=params.get("start"),
+                end=params.get("end"),
+                nets=params.get("nets") in ("1", "true")
+            )
+            try:
+                if export_format not in EXPORT_FORMATS:
+                    raise ValueError(f"Unknown format {export_format}")
+                export_schema(store, query)  # Fail with 4xx before the response starts
+            except FileNotFoundError as e:
+                self._send_json(404, {"error": str(e)})
+                return
+            except ValueError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+
+            content_type = "application/vnd.apache.arrow.stream" if export_format == "arrow" else "application/vnd.apache.parquet"
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            sink = pa.PythonFile(self.wfile, mode="w")
+            write_export(store, query, sink, export_format)
+            sink.flush()
+
+    return ExportHandler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Export the local COT store as Arrow IPC / Parquet.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Local store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dump = commands.add_parser("dump", help="Write one table to a file")
+    dump.add_argument("--dataset", required=True, help="e.g. QDL/FON")
+    dump.add_argument("--type", required=True, help="e.g. F_ALL")
+    dump.add_argument("--columns", help="Comma-separated columns (default: all)")
+    dump.add_argument("--codes", help="Comma-separated contract codes (default: all)")
+    dump.add_argument("--start", help="First date, YYYY-MM-DD")
+    dump.add_argument("--end", help="Last date, YYYY-MM-DD")
+    dump.add_argument("--nets", action="store_true", help="Append derived net positions")
+    dump.add_argument("--format", choices=EXPORT_FORMATS, default="parquet")
+    dump.add_argument("-o", "--output", required=True, help="Output file")
+
+    serve = commands.add_parser("serve", help="Serve the store over HTTP")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+
+    args = parser.parse_args()
+    store = CotStore(args.data_dir)
+
+    if args.command == "dump":
+        query = ExportQuery(
+            args.dataset,
+            args.type,
+            columns=args.columns.split(",") if args.columns else None,
+            contract_codes=args.codes.split(",") if args.codes else None,
+            start=args.start,
+            end=args.end,
+            nets=args.nets
+        )
+        rows = write_export(store, query, args.output, args.format)
+        print(f"Wrote {rows} rows to {args.output}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), make_handler(store))
+        print(f"Serving {args.data_dir} on http://{args.host}:{args.port}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
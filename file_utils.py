@@ -0,0 +1,91 @@
+import os
+import time
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to an exclusive lock file
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = 10.0, poll_interval: float = 0.05) -> Iterator[None]:
+    """
+    Hold an exclusive, cross-process lock for `path` while the block runs.
+
+    The lock lives in a sibling `<path>.lock` file so the guarded file itself can be
+    replaced atomically while the lock is held.
+
+    Args:
+        path (str): File to guard.
+        timeout (float): Seconds to wait for the lock before giving up.
+        poll_interval (float): Seconds between acquisition attempts.
+
+    Raises:
+        TimeoutError: If the lock could not be acquired within `timeout`.
+    """
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+
+    if fcntl is not None:
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            while True:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timed out waiting for lock on {path}")
+                    time.sleep(poll_interval)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+        return
+
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            break
+        except FileExistsError:
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out waiting for lock on {path}")
+            time.sleep(poll_interval)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def atomic_write(path: str, content: Union[str, bytes]) -> None:
+    """
+    Write `content` to `path` so readers only ever see the old or the new file.
+
+    The data goes to a temporary file in the same directory, is flushed to disk and
+    then renamed over the target, which is atomic on POSIX and Windows.
+
+    Args:
+        path (str): Destination file.
+        content (Union[str, bytes]): Text (written as UTF-8) or raw bytes.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    data = content.encode("utf-8") if isinstance(content, str) else content
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
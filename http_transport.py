@@ -0,0 +1,224 @@
+import copy
+import gzip
+import json
+import threading
+import time
+import urllib.request
+import warnings
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from nasdaqdatalink.api_config import ApiConfig
+from nasdaqdatalink.connection import Connection
+from nasdaqdatalink.errors.data_link_error import LimitExceededError
+from nasdaqdatalink.message import Message
+from nasdaqdatalink.util import Util
+from nasdaqdatalink.utils.request_type_util import RequestType
+from nasdaqdatalink.version import VERSION
+
+# Keep-alive connections kept open; more concurrent calls open extra, short-lived ones
+POOL_SIZE = 16
+# Threads downloading the next cursor page of multi-page calls
+PREFETCH_WORKERS = 4
+# Per-request metrics kept in memory (oldest dropped first)
+METRICS_HISTORY = 1000
+
+# Datatable column types parsed as numbers; everything else but Date stays as Python objects
+NUMERIC_TYPES = ("integer", "long", "double", "float", "bigdecimal")
+
+
+class PooledTransport:
+    """
+    HTTP client for Nasdaq Data Link datatables, returning the same DataFrames as
+    `nasdaqdatalink.get_table`.
+
+    - One `requests.Session` with a keep-alive connection pool is shared by every call and thread,
+      instead of a new session (and TLS handshake) per request.
+    - Responses are requested gzip-compressed.
+    - While one page is being parsed, the next cursor page is already being downloaded. The first
+      page of every call is requested on the caller's thread, so concurrent callers (e.g. several
+      Streamlit sessions) never queue behind each other on the prefetch pool.
+    - Each page is converted column by column into numpy arrays; the per-page arrays are
+      concatenated once at the end instead of building and concatenating row lists or frames.
+    - Every request records wire and decoded bytes, rows and latencies in `metrics`.
+
+    Request encoding (GET, or POST for long filter lists), authentication, retries, page limit
+    and error handling follow the nasdaqdatalink client settings in `ApiConfig`.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, prefetch: bool = True, prefetch_workers: int = PREFETCH_WORKERS):
+        self.prefetch = prefetch
+        self.metrics = deque(maxlen=METRICS_HISTORY)
+        self._metrics_lock = threading.Lock()
+        # Only next-cursor downloads run here; sized separately from the connection pool
+        self._executor = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix="datalink-prefetch")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=Connection.get_retries())
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.proxies.update(urllib.request.getproxies())
+        self.session.headers.update({
+            "accept": "application/json",
+            "accept-encoding": "gzip, deflate",
+            "request-source": "python",
+            "request-source-version": VERSION,
+        })
+
+    def _request(self, dataset_code: str, params: Dict, page: int) -> Dict:
+        # Download and JSON-decode one page, on the caller's thread or the prefetch pool
+        path = Util.constructed_path("datatables/:id", {"id": dataset_code})
+        request_type = RequestType.get_request_type(path, params=params)
+        options = Util.convert_options(request_type=request_type, params=params)
+        headers = {"x-api-token": ApiConfig.api_key} if ApiConfig.api_key else {}
+
+        started = time.perf_counter()
+        response = self.session.request(
+            request_type,
+            f"{ApiConfig.api_base}/{path}",
+            headers=headers,
+            verify=ApiConfig.verify_ssl,
+            stream=True,
+            **options
+        )
+        if response.status_code < 200 or response.status_code >= 300:
+            Connection.handle_api_error(response)  # Raises the matching DataLinkError
+        first_byte = time.perf_counter()
+
+        raw = response.raw.read(decode_content=False)  # Bytes as sent over the wire
+        encoding = response.headers.get("content-encoding", "").lower()
+        if encoding == "gzip":
+            body = gzip.decompress(raw)
+        elif encoding == "deflate":
+            body = zlib.decompress(raw)
+        else:
+            body = raw
+        downloaded = time.perf_counter()
+        payload = json.loads(body)
+        decoded = time.perf_counter()
+
+        self._record({
+            "dataset_code": dataset_code,
+            "page": page,
+            "method": request_type.upper(),
+            "status": response.status_code,
+            "encoding": encoding or "identity",
+            "wire_bytes": len(raw),
+            "body_bytes": len(body),
+            "rows": len(payload["datatable"]["data"]),
+            "time_to_first_byte_ms": (first_byte - started) * 1000,
+            "download_ms": (downloaded - first_byte) * 1000,
+            "decode_ms": (decoded - downloaded) * 1000,
+        })
+        return payload
+
+    def _record(self, metric: Dict) -> None:
+        with self._metrics_lock:
+            self.metrics.append(metric)
+
+    def get_table(self, dataset_code: str, **options) -> pd.DataFrame:
+        """
+        Fetch a datatable with the same arguments as `nasdaqdatalink.get_table`.
+
+        Raises:
+            LimitExceededError: If more than `ApiConfig.page_limit` pages would be fetched.
+            DataLinkError: For API errors, as raised by the nasdaqdatalink client.
+        """
+        paginate = options.pop("paginate", None)
+        params = copy.deepcopy(options)
+
+        columns = None
+        chunks: List[List[np.ndarray]] = []
+        page = 0
+        payload = self._request(dataset_code, params, page)
+        while payload is not None:
+            pending = None
+
+            next_cursor_id = payload["meta"].get("next_cursor_id")
+            if next_cursor_id is not None:
+                if page >= ApiConfig.page_limit:
+                    raise LimitExceededError(Message.WARN_DATA_LIMIT_EXCEEDED % (dataset_code, ApiConfig.api_key))
+                if paginate is True:
+                    params = dict(params, **{"qopts.cursor_id": next_cursor_id})
+                    if self.prefetch:
+                        # Download the next page while this one is parsed
+                        pending = self._executor.submit(self._request, dataset_code, params, page + 1)
+                else:
+                    warnings.warn(Message.WARN_PAGE_LIMIT_EXCEEDED, UserWarning)
+
+            datatable = payload["datatable"]
+            if columns is None:
+                columns = datatable["columns"]
+            chunks.append(_page_columns(datatable["data"], columns))
+
+            page += 1
+            if pending is not None:
+                payload = pending.result()
+            elif next_cursor_id is not None and paginate is True:
+                payload = self._request(dataset_code, params, page)
+            else:
+                payload = None
+
+        return _to_frame(columns or [], chunks)
+
+    def summary(self, dataset_code: Optional[str] = None) -> Dict:
+        """
+        Totals over the recorded requests, optionally for one dataset.
+
+        Returns:
+            Dict: requests, rows, wire/body bytes, compression ratio and latency percentiles (ms).
+        """
+        with self._metrics_lock:
+            metrics = [m for m in self.metrics if dataset_code is None or m["dataset_code"] == dataset_code]
+        if not metrics:
+            return {"requests": 0}
+        total_ms = np.array([m["time_to_first_byte_ms"] + m["download_ms"] + m["decode_ms"] for m in metrics])
+        wire = sum(m["wire_bytes"] for m in metrics)
+        body = sum(m["body_bytes"] for m in metrics)
+        return {
+            "requests": len(metrics),
+            "rows": sum(m["rows"] for m in metrics),
+            "wire_bytes": wire,
+            "body_bytes": body,
+            "compression_ratio": body / wire if wire else float("nan"),
+            "p50_ms": float(np.percentile(total_ms, 50)),
+            "p95_ms": float(np.percentile(total_ms, 95)),
+            "time_to_first_byte_ms": sum(m["time_to_first_byte_ms"] for m in metrics),
+            "download_ms": sum(m["download_ms"] for m in metrics),
+            "decode_ms": sum(m["decode_ms"] for m in metrics),
+        }
+
+
+def _page_columns(rows: List[List], columns: List[Dict]) -> List[np.ndarray]:
+    """Convert one page of row lists into one typed numpy array per column."""
+    if not rows:
+        return [np.array([], dtype=object) for _ in columns]
+    arrays = []
+    for values, column in zip(zip(*rows), columns):
+        column_type = column["type"].lower()
+        if column_type == "date":
+            arrays.append(np.array(values, dtype="datetime64[ns]"))
+        elif column_type.startswith(NUMERIC_TYPES):
+            arrays.append(np.array([np.nan if v is None else v for v in values], dtype=float)
+                          if None in values else np.array(values))
+        else:
+            arrays.append(np.array(values, dtype=object))
+    return arrays
+
+
+def _to_frame(columns: List[Dict], chunks: List[List[np.ndarray]]) -> pd.DataFrame:
+    names = [column["name"] for column in columns]
+    chunks = [chunk for chunk in chunks if len(chunk[0])] if columns else []
+    if not chunks:
+        return pd.DataFrame(columns=names)
+    return pd.DataFrame({
+        name: np.concatenate([chunk[i] for chunk in chunks]) if len(chunks) > 1 else chunks[0][i]
+        for i, name in enumerate(names)
+    })
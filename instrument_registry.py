@@ -0,0 +1,153 @@
+import os
+import json
+import datetime
+import functools
+from typing import Callable, Dict, Iterable, Optional, Set, Tuple
+
+import data_source
+from file_utils import atomic_write, file_lock
+
+# Dataset and report type used to check whether a contract code exists at the source.
+# Disaggregated codes are looked up first; codes only published in the legacy report
+# are then looked up in QDL/LFON.
+CODE_CHECK_SOURCES = {
+    "QDL/FON": "F_ALL",
+    "QDL/LFON": "F_L_ALL",
+}
+
+# Only reports this recent are requested, so a check reads about one year of rows per code
+# instead of each code's full history. Codes without a report in this window count as unknown.
+CODE_CHECK_LOOKBACK_DAYS = 366
+
+RegistryVersion = Tuple[int, int, int]
+
+
+class InstrumentRegistry:
+    """
+    Concurrent-safe access to the instrument name -> contract code mapping in instruments.json.
+
+    Writes take an exclusive file lock, re-read the current file, apply the change and
+    replace the file atomically, so simultaneous edits from several sessions neither
+    corrupt the file nor lose each other's updates. The file format is unchanged.
+
+    Every successful write changes `version()`, a cheap stat-based token that sessions
+    can compare to decide whether their cached mapping is stale.
+    """
+
+    def __init__(self, path: str = "instruments.json"):
+        self.path = path
+
+    def version(self) -> RegistryVersion:
+        """
+        Return a token that changes whenever the file is rewritten.
+
+        Atomic replacement always creates a new inode, so (inode, mtime, size) changes
+        on every write even within the filesystem's timestamp resolution.
+
+        Raises:
+            FileNotFoundError: If the registry file does not exist.
+        """
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def load(self) -> Dict[str, str]:
+        """
+        Read the mapping from disk.
+
+        Raises:
+            FileNotFoundError: If the registry file does not exist.
+            json.JSONDecodeError: If the file is not valid JSON.
+        """
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def update(self, mutate: Callable[[Dict[str, str]], None]) -> Dict[str, str]:
+        """
+        Apply `mutate` to the latest on-disk mapping under the file lock and persist it.
+
+        Args:
+            mutate (Callable[[Dict[str, str]], None]): Function modifying the mapping in place.
+
+        Returns:
+            Dict[str, str]: The mapping as written.
+        """
+        with file_lock(self.path):
+            mapping = self.load() if os.path.exists(self.path) else {}
+            mutate(mapping)
+            atomic_write(self.path, json.dumps(mapping, indent=4))
+        return mapping
+
+    def add(self, name: str, code: str) -> Dict[str, str]:
+        """Add an instrument, or change the code of an existing one."""
+        def mutate(mapping: Dict[str, str]) -> None:
+            mapping[name] = code
+
+        return self.update(mutate)
+
+    def remove(self, name: str) -> Dict[str, str]:
+        """
+        Remove an instrument.
+
+        Raises:
+            KeyError: If no instrument with that name is registered (e.g. another session removed it).
+        """
+        def mutate(mapping: Dict[str, str]) -> None:
+            if name not in mapping:
+                raise KeyError(name)
+            del mapping[name]
+
+        return self.update(mutate)
+
+    def find_unknown_codes(self, codes: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Return the codes that the data source does not know.
+
+        All codes are checked with one `get_table` call per source dataset instead of one
+        call per code. Only the `contract_code` column of the last `CODE_CHECK_LOOKBACK_DAYS`
+        is requested, so inactive codes are reported as unknown too.
+
+        Args:
+            codes (Optional[Iterable[str]]): Codes to check. Defaults to every registered code.
+
+        Returns:
+            Set[str]: Codes without a recent report in any of the `CODE_CHECK_SOURCES` datasets.
+        """
+        if codes is None:
+            codes = self.load().values()
+        pending = set(codes)
+        since = (datetime.date.today() - datetime.timedelta(days=CODE_CHECK_LOOKBACK_DAYS)).isoformat()
+
+        for dataset_code, type_category in CODE_CHECK_SOURCES.items():
+            if not pending:
+                break
+            found = data_source.get_table(
+                dataset_code,
+                contract_code=sorted(pending),
+                type=type_category,
+                date={"gte": since},
+                qopts={"columns": ["contract_code"]},
+                paginate=True
+            )
+            pending -= set(found["contract_code"].astype(str))
+
+        return pending
+
+
+def load_instrument_mapping(path: str, version: RegistryVersion) -> Dict[str, str]:
+    """
+    Read the mapping once for all Streamlit sessions. `version` (from `InstrumentRegistry.version()`)
+    only keys the cache, so the file is re-read exactly when it was rewritten.
+    """
+    return _cached_loader()(path, version)
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_loader():
+    # Created on first use: the CLI scripts import this module without a Streamlit runtime
+    import streamlit as st
+
+    @st.cache_data(show_spinner=False)
+    def load(path: str, version: RegistryVersion) -> Dict[str, str]:
+        return InstrumentRegistry(path).load()
+
+    return load
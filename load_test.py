@@ -0,0 +1,343 @@
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+from websockets.sync.client import connect
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from cot_store import CotStore, DATA_DIR
+from data_source import OFFLINE_DATA_DIR_ENV, OFFLINE_ENV
+from instrument_registry import InstrumentRegistry
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SETUP_PAGE = os.path.join(APP_DIR, "cot_setup.py")
+MONITOR_PAGE = "cot_monitor"
+RERUN_TIMEOUT = 120
+SERVER_START_TIMEOUT = 60
+
+# Interaction scripts: how the setup page is filled in for each report
+SCENARIOS: Dict[str, Dict] = {
+    "disaggregated": {"dataset": "QDL/FON", "legacy": False, "suffix": None, "type": "F_ALL"},
+    "legacy": {"dataset": "QDL/LFON", "legacy": True, "suffix": None, "type": "F_L_ALL"},
+    "concentration": {"dataset": "QDL/FCR", "legacy": False, "suffix": "_CR", "type": "F_ALL_CR"},
+}
+
+# Element types sent as widgets by the pages under test
+WIDGET_TYPES = ("button", "checkbox", "multiselect", "selectbox")
+
+
+class Server:
+    """
+    A `streamlit run` server for the app on a free local port, answering from the local store
+    (COT_OFFLINE=1). Sessions connect to it over the same websocket a browser uses.
+    """
+
+    def __init__(self, data_dir: str):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+
+        # Pages fall back to st.secrets when there is no secrets.toml next to the app
+        self._secrets = tempfile.NamedTemporaryFile("w", suffix=".toml", delete=False)
+        self._secrets.write('NASDAQ_API_KEY = "offline-load-test"\n')
+        self._secrets.close()
+
+        env = dict(os.environ, **{OFFLINE_ENV: "1", OFFLINE_DATA_DIR_ENV: data_dir})
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "streamlit", "run", SETUP_PAGE,
+                "--server.headless=true",
+                "--server.address=127.0.0.1",
+                f"--server.port={self.port}",
+                "--server.fileWatcherType=none",
+                "--browser.gatherUsageStats=false",
+                f"--secrets.files={self._secrets.name}",
+            ],
+            cwd=APP_DIR,  # Pages resolve instruments.json and secrets.toml relative to the app
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        self._wait_healthy()
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/_stcore/stream"
+
+    def _wait_healthy(self) -> None:
+        deadline = time.time() + SERVER_START_TIMEOUT
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"streamlit exited with code {self.process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        self.close()
+        raise RuntimeError(f"streamlit did not answer on port {self.port} within {SERVER_START_TIMEOUT}s")
+
+    def rss_bytes(self) -> int:
+        """Resident set size of the server process (Linux), or 0 where /proc is unavailable."""
+        try:
+            with open(f"/proc/{self.process.pid}/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return 0
+
+    def close(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        os.unlink(self._secrets.name)
+
+
+class Session:
+    """
+    One simulated analyst: a websocket client of the server walking through setup and monitor pages.
+
+    Widget values are sent the way the browser sends them, so every rerun runs the real script on
+    the server, with the server's shared caches. Each rerun (request to script_finished) is timed
+    into `latencies`, in seconds.
+    """
+
+    def __init__(self, connection, scenario: str, instruments: List[str], rng: random.Random):
+        self.scenario = SCENARIOS[scenario]
+        self.instruments = instruments
+        self.rng = rng
+        self.latencies: List[float] = []
+        self.errors: List[str] = []
+        self.pages: Dict[str, str] = {}  # url_pathname -> page_script_hash, from st's navigation message
+        self.page_hash = ""
+        self.widgets: Dict[str, Dict] = {}  # label or key -> {"type", "proto"} of the last run
+        self.states: Dict[str, WidgetState] = {}  # Widget values set by this session, by widget id
+        self.connection = connection
+
+    def widget(self, element_type: str, label: str):
+        widget = self.widgets.get(label)
+        if widget is None or widget["type"] != element_type:
+            raise LookupError(f"No {element_type} labelled {label!r}")
+        return widget["proto"]
+
+    def set_state(self, element_type: str, label: str, **value) -> None:
+        proto = self.widget(element_type, label)
+        state = WidgetState(id=proto.id)
+        for field, field_value in value.items():
+            if field.endswith("array_value"):
+                getattr(state, field).data[:] = field_value
+            else:
+                setattr(state, field, field_value)
+        self.states[proto.id] = state
+
+    def checked(self, label: str) -> bool:
+        proto = self.widget("checkbox", label)
+        state = self.states.get(proto.id)
+        return state.bool_value if state is not None else proto.default
+
+    def _rerun(self, triggers: Optional[List[str]] = None) -> None:
+        # Buttons are one-shot: their trigger is sent with this rerun only
+        message = BackMsg()
+        client_state = message.rerun_script
+        client_state.page_script_hash = self.page_hash
+        client_state.widget_states.widgets.extend(self.states.values())
+        for label in triggers or []:
+            client_state.widget_states.widgets.append(WidgetState(id=self.widget("button", label).id, trigger_value=True))
+
+        started = time.perf_counter()
+        self.connection.send(message.SerializeToString())
+        self.widgets = {}
+        while True:
+            forward = ForwardMsg.FromString(self.connection.recv(timeout=RERUN_TIMEOUT))
+            kind = forward.WhichOneof("type")
+            if kind == "navigation":
+                self.pages = {page.url_pathname: page.page_script_hash for page in forward.navigation.app_pages}
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    self.errors.append(f"{element.exception.type}: {element.exception.message}")
+                elif element_type in WIDGET_TYPES:
+                    proto = getattr(element, element_type)
+                    self.widgets[proto.label] = {"type": element_type, "proto": proto}
+                    key = proto.id.split("-", 2)[-1]  # Widget ids end with the user key, or "None"
+                    if key != "None":
+                        self.widgets[key] = {"type": element_type, "proto": proto}
+            elif kind == "script_finished":
+                if forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    break
+                self.widgets = {}  # st.rerun(): the script starts over
+        self.latencies.append(time.perf_counter() - started)
+
+    def switch_page(self, url_pathname: str) -> None:
+        self.page_hash = self.pages[url_pathname]
+        self.states = {}  # The browser only sends the widgets of the page it shows
+        self._rerun()
+
+    def run(self, interactions: int) -> None:
+        scenario = self.scenario
+        self._rerun()
+
+        # Setup page: dataset, instrument, report type
+        self.set_state("selectbox", "Select Dataset Code", string_value=scenario["dataset"])
+        self.set_state("selectbox", "Select an Instrument", string_value=self.rng.choice(self.instruments))
+        if scenario["legacy"]:
+            self.set_state("checkbox", "Use Legacy Format if QDL/LFON is selected ", bool_value=True)
+        if scenario["suffix"]:
+            self.set_state("multiselect", "Select Additional Categories", string_array_value=[scenario["suffix"]])
+        self._rerun()
+        if scenario["suffix"]:
+            self.set_state("selectbox", "Select Type & Category", string_value=scenario["type"])
+            self._rerun()
+
+        # Monitor page
+        self.switch_page(MONITOR_PAGE)
+
+        toggle = [
+            label for label, widget in self.widgets.items()
+            if widget["type"] == "checkbox" and label.split("_")[0] in ("positions", "spread", "net", "participation", "concentration")
+        ]
+        for _ in range(interactions):
+            if not toggle:
+                break
+            key = self.rng.choice(toggle)
+            self.set_state("checkbox", key, bool_value=not self.checked(key))
+            self._rerun()
+
+        if "Use Bar Charts (uncheck for Line Charts)" in self.widgets:
+            self.set_state("checkbox", "Use Bar Charts (uncheck for Line Charts)", bool_value=True)
+            self._rerun()
+
+        # Highlight periods
+        self.set_state("checkbox", "Define Highlight Periods for Instrument", bool_value=True)
+        self._rerun()
+        self._rerun(triggers=["Add Recurring Highlight Period"])
+
+
+def _run_session(
+        server: Server,
+        scenario: str,
+        instruments: List[str],
+        interactions: int,
+        seed: int,
+        start: threading.Barrier,
+        finish: threading.Barrier
+) -> Dict:
+    # Runs on a client thread. The session stays connected until every session has finished,
+    # so the server still holds all of their state when `finish` measures memory.
+    with connect(server.url, max_size=None, open_timeout=RERUN_TIMEOUT) as connection:
+        session = Session(connection, scenario, instruments, random.Random(seed))
+        start.wait(RERUN_TIMEOUT)
+        started = time.time()
+        errors = []
+        try:
+            session.run(interactions)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        finished = time.time()
+        finish.wait()
+    return {
+        "latencies": session.latencies,
+        "started": started,
+        "finished": finished,
+        "errors": errors + session.errors,
+    }
+
+
+def run_level(data_dir: str, concurrency: int, scenarios: List[str], instruments: List[str], interactions: int, seed: int) -> Dict:
+    """
+    Run `concurrency` sessions at once against a fresh server and summarize rerun latency,
+    throughput and memory.
+
+    One session runs to completion first so imports, page compilation and the shared caches it
+    fills are part of the baseline; memory per session is the server's RSS growth from that
+    baseline, measured while all sessions are still connected, divided by `concurrency`.
+    """
+    server = Server(data_dir)
+    try:
+        warmup = _run_session(server, scenarios[0], instruments, interactions, seed - 1, threading.Barrier(1), threading.Barrier(1))
+        rss = [server.rss_bytes()]
+
+        start = threading.Barrier(concurrency)
+        finish = threading.Barrier(concurrency, action=lambda: rss.append(server.rss_bytes()))
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            futures = [
+                pool.submit(_run_session, server, scenarios[i % len(scenarios)], instruments, interactions, seed + i, start, finish)
+                for i in range(concurrency)
+            ]
+            sessions = [future.result() for future in futures]
+    finally:
+        server.close()
+
+    timings = np.array([latency for session in sessions for latency in session["latencies"]]) * 1000
+    wall = max(session["finished"] for session in sessions) - min(session["started"] for session in sessions)
+    return {
+        "concurrency": concurrency,
+        "reruns": len(timings),
+        "p50_ms": float(np.percentile(timings, 50)) if len(timings) else float("nan"),
+        "p95_ms": float(np.percentile(timings, 95)) if len(timings) else float("nan"),
+        "p99_ms": float(np.percentile(timings, 99)) if len(timings) else float("nan"),
+        "throughput_rps": len(timings) / wall if wall > 0 else float("nan"),
+        "memory_per_session_mb": max(rss[-1] - rss[0], 0) / concurrency / 2 ** 20,
+        "errors": warmup["errors"] + [error for session in sessions for error in session["errors"]],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test the dashboard with concurrent browser sessions against a local streamlit server.")
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma-separated concurrency levels")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Interaction scripts ({', '.join(SCENARIOS)})")
+    parser.add_argument("--interactions", type=int, default=5, help="Series checkbox toggles per session")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Local store used as the offline backend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data_dir)
+    os.chdir(APP_DIR)
+
+    scenarios = args.scenarios.split(",")
+    store = CotStore(data_dir)
+    missing = [SCENARIOS[name]["dataset"] + " " + SCENARIOS[name]["type"] for name in scenarios
+               if not store.exists(SCENARIOS[name]["dataset"], SCENARIOS[name]["type"])]
+    if missing:
+        raise SystemExit(f"Offline store has no data for {', '.join(missing)}. Run weekly_sync.py or bulk_import.py first.")
+
+    mapping = InstrumentRegistry("instruments.json").load()
+    stored = set(store.last_dates(SCENARIOS[scenarios[0]]["dataset"], SCENARIOS[scenarios[0]]["type"]))
+    instruments = [name for name, code in mapping.items() if code in stored]
+    if not instruments:
+        raise SystemExit("None of the instruments in instruments.json are in the offline store.")
+
+    results = []
+    print(f"{'sessions':>8} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'reruns/s':>9} {'MB/session':>11} {'errors':>7}")
+    for level in [int(level) for level in args.levels.split(",")]:
+        result = run_level(data_dir, level, scenarios, instruments, args.interactions, args.seed)
+        results.append(result)
+        print(f"{result['concurrency']:>8} {result['reruns']:>7} {result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} "
+              f"{result['p99_ms']:>8.0f} {result['throughput_rps']:>9.2f} {result['memory_per_session_mb']:>11.1f} {len(result['errors']):>7}")
+        for error in result["errors"][:3]:
+            print(f"    {error}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
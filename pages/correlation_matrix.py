@@ -0,0 +1,151 @@
+import streamlit as st
+import nasdaqdatalink
+import plotly.express as px
+import pandas as pd
+import os
+import toml
+import threading
+from cot_store import CotStore
+from correlation import POSITIONING_NETS, OPEN_INTEREST_COLUMN, RollingCorrelation, weekly_changes
+from instrument_registry import InstrumentRegistry, load_instrument_mapping
+
+
+st.title("CFTC Monitor - Positioning Correlations")
+
+# Try loading API Key from local file
+api_key = st.session_state.get("api_key", None)  # Use session state if already set
+
+if not api_key and os.path.exists("secrets.toml"):
+    try:
+        local_secrets = toml.load("secrets.toml")
+        api_key = local_secrets.get("NASDAQ_API_KEY")
+    except Exception as e:
+        st.error(f"Error loading local secrets: {e}")
+
+# If not found locally, try getting from Streamlit Cloud
+if not api_key:
+    api_key = st.secrets.get("NASDAQ_API_KEY", None)
+
+# Handle missing API key
+if not api_key:
+    st.error("API Key is missing! Please add it in Streamlit Secrets or `secrets.toml`.")
+    st.stop()
+
+# Set API Key for Nasdaq Data Link & store in session state
+st.session_state.api_key = api_key
+nasdaqdatalink.ApiConfig.api_key = api_key
+
+store = CotStore()
+registry = InstrumentRegistry("instruments.json")
+instrument_mapping = load_instrument_mapping(registry.path, registry.version())
+code_to_name = {code: name for name, code in instrument_mapping.items()}
+
+# Selection of the report and the two metrics to correlate
+dataset_code = st.selectbox("Select Dataset Code", ["QDL/FON", "QDL/LFON"])  # Reports with F/FO _ALL and _ALL_OI types
+base_type = st.selectbox("Select Base Type", ["F", "FO"])
+prefix = f"{base_type}_L" if dataset_code == "QDL/LFON" else base_type
+
+# Nets from the _OI category are the same formulas on positions expressed as % of open interest
+metric_options = {}
+for net in POSITIONING_NETS[dataset_code]:
+    metric_options[net] = (f"{prefix}_ALL", net)
+    metric_options[f"{net} (% of OI)"] = (f"{prefix}_ALL_OI", net)
+metric_options["open_interest"] = (f"{prefix}_ALL", OPEN_INTEREST_COLUMN)
+
+row_metric = st.selectbox("Weekly Change In (rows)", list(metric_options.keys()), index=0)
+col_metric = st.selectbox("Correlated With (columns)", list(metric_options.keys()), index=0)
+window = st.slider("Rolling Window (weeks)", min_value=13, max_value=260, value=52, step=1)
+
+needed_types = sorted({metric_options[row_metric][0], metric_options[col_metric][0]})
+
+if st.button("Sync Instruments from Nasdaq Data Link"):
+    with st.spinner("Syncing..."):
+        try:
+            for type_category in needed_types:
+                new_rows = store.sync(dataset_code, type_category, instrument_mapping.values())
+                st.success(f"{type_category}: {len(new_rows)} new rows")
+        except Exception as e:
+            st.error(f"Error syncing data: {e}")
+
+missing_types = [type_category for type_category in needed_types if not store.exists(dataset_code, type_category)]
+if missing_types:
+    st.info(f"No local data for {', '.join(missing_types)} yet. Use the sync button above.")
+    st.stop()
+
+
+@st.cache_data(show_spinner=False)
+def load_changes(dataset_code, type_category, metric, codes, fingerprint):
+    # `fingerprint` only keys the cache so the frame is rebuilt exactly when the stored data changes
+    frame = store.load(dataset_code, type_category, contract_codes=list(codes))
+    return weekly_changes(frame, dataset_code, metric)
+
+
+@st.cache_resource(show_spinner=False)
+def correlation_engine(key, window):
+    # One engine per metric pair and window, shared by all sessions and fed only new weeks
+    return {"engine": None, "lock": threading.Lock()}
+
+
+codes = tuple(sorted(instrument_mapping.values()))
+row_type, row_column = metric_options[row_metric]
+col_type, col_column = metric_options[col_metric]
+row_changes = load_changes(dataset_code, row_type, row_column, codes, store.fingerprint(dataset_code, row_type))
+col_changes = load_changes(dataset_code, col_type, col_column, codes, store.fingerprint(dataset_code, col_type))
+
+same_metric = row_metric == col_metric
+if same_metric:
+    combined = row_changes
+else:
+    combined = pd.concat([row_changes.add_prefix("row:"), col_changes.add_prefix("col:")], axis=1).sort_index()
+
+if combined.empty:
+    st.warning("No overlapping data for the selected instruments.")
+    st.stop()
+
+# Reuse the engine across reruns; only weeks newer than its last update are fed,
+# unless a revision changed weeks inside its window
+state = correlation_engine((dataset_code, row_metric, col_metric, codes), window)
+with state["lock"]:
+    engine = state["engine"]
+    if engine is None or engine.columns != list(combined.columns) or not engine.matches(combined):
+        engine = RollingCorrelation.from_frame(combined, window)
+        state["engine"] = engine
+    else:
+        engine.update_frame(combined)
+    matrix = engine.corr()
+if not same_metric:
+    matrix = matrix.loc[[f"row:{c}" for c in row_changes.columns], [f"col:{c}" for c in col_changes.columns]]
+    matrix.index = row_changes.columns
+    matrix.columns = col_changes.columns
+
+matrix.index = [code_to_name.get(code, code) for code in matrix.index]
+matrix.columns = [code_to_name.get(code, code) for code in matrix.columns]
+
+st.subheader(f"{window}-Week Rolling Correlation as of {pd.Timestamp(engine.last_date).date()}")
+fig = px.imshow(
+    matrix,
+    zmin=-1, zmax=1,
+    color_continuous_scale="RdBu",
+    text_auto=".2f",
+    aspect="auto",
+    labels=dict(x=col_metric, y=row_metric, color="Correlation")
+)
+fig.update_layout(height=max(500, 28 * len(matrix)), width=1200)
+st.plotly_chart(fig, use_container_width=True)
+
+# Rolling correlation history for a single pair
+st.subheader("Rolling Correlation for a Pair")
+pair_row = st.selectbox("Row Instrument", list(row_changes.columns), format_func=lambda code: code_to_name.get(code, code))
+pair_col = st.selectbox("Column Instrument", list(col_changes.columns), format_func=lambda code: code_to_name.get(code, code))
+pair = pd.concat([row_changes[pair_row].rename("x"), col_changes[pair_col].rename("y")], axis=1)
+pair_corr = pair["x"].rolling(window, min_periods=engine.min_periods).corr(pair["y"])
+
+fig2 = px.line(x=pair_corr.index, y=pair_corr.values, title=f"{code_to_name.get(pair_row, pair_row)} vs {code_to_name.get(pair_col, pair_col)}")
+fig2.update_layout(
+    xaxis_title="Date",
+    yaxis_title="Correlation",
+    yaxis_range=[-1, 1],
+    height=500,
+    width=1200
+)
+st.plotly_chart(fig2, use_container_width=True)
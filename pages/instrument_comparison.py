@@ -0,0 +1,137 @@
+import streamlit as st
+import nasdaqdatalink
+import pandas as pd
+import os
+import toml
+from cot_store import CotStore
+from chart_schema import DATASET_SCHEMAS
+from comparison import COT_INDEX_WEEKS, cot_index, fill_gaps, load_metric, metric_columns, overlay_figure
+from instrument_registry import InstrumentRegistry, load_instrument_mapping
+
+
+st.title("CFTC Monitor - Instrument Comparison")
+
+# Try loading API Key from local file
+api_key = st.session_state.get("api_key", None)  # Use session state if already set
+
+if not api_key and os.path.exists("secrets.toml"):
+    try:
+        local_secrets = toml.load("secrets.toml")
+        api_key = local_secrets.get("NASDAQ_API_KEY")
+    except Exception as e:
+        st.error(f"Error loading local secrets: {e}")
+
+# If not found locally, try getting from Streamlit Cloud
+if not api_key:
+    api_key = st.secrets.get("NASDAQ_API_KEY", None)
+
+# Handle missing API key
+if not api_key:
+    st.error("API Key is missing! Please add it in Streamlit Secrets or `secrets.toml`.")
+    st.stop()
+
+# Set API Key for Nasdaq Data Link & store in session state
+st.session_state.api_key = api_key
+nasdaqdatalink.ApiConfig.api_key = api_key
+
+store = CotStore()
+registry = InstrumentRegistry("instruments.json")
+instrument_mapping = load_instrument_mapping(registry.path, registry.version())
+code_to_name = {code: name for name, code in instrument_mapping.items()}
+
+# Report and type: defaults follow the setup page selection
+dataset_codes = list(DATASET_SCHEMAS.keys())
+session_dataset = st.session_state.get("dataset_code")
+dataset_code = st.selectbox(
+    "Select Dataset Code",
+    dataset_codes,
+    index=dataset_codes.index(session_dataset) if session_dataset in dataset_codes else 0
+)
+
+stored_types = [type_category for stored_dataset, type_category in store.tables() if stored_dataset == dataset_code]
+session_type = st.session_state.get("selected_type_category")
+type_category = st.selectbox(
+    "Select Type & Category",
+    stored_types,
+    index=stored_types.index(session_type) if session_type in stored_types else 0
+) if stored_types else None
+
+if st.button("Sync Instruments from Nasdaq Data Link"):
+    sync_type = type_category or session_type
+    if not sync_type:
+        st.error("Select a type on the setup page first.")
+    else:
+        with st.spinner("Syncing..."):
+            try:
+                new_rows = store.sync(dataset_code, sync_type, instrument_mapping.values())
+                st.success(f"{sync_type}: {len(new_rows)} new rows")
+            except Exception as e:
+                st.error(f"Error syncing data: {e}")
+        if type_category is None and store.exists(dataset_code, sync_type):
+            st.rerun()  # First sync of this dataset: list the new table
+
+if type_category is None:
+    st.info(f"No local data for {dataset_code} yet. Use the sync button above.")
+    st.stop()
+
+# Instruments and metric to overlay
+stored_codes = store.last_dates(dataset_code, type_category)
+names = sorted(name for name, code in instrument_mapping.items() if code in stored_codes)
+session_name = code_to_name.get(st.session_state.get("instrument_code"))
+selected_names = st.multiselect(
+    "Select Instruments",
+    names,
+    default=[session_name] if session_name in names else names[:2]
+)
+
+metrics = metric_columns(store, dataset_code, type_category)
+metric = st.selectbox("Select Metric", metrics)
+normalize = st.checkbox(
+    "Normalize as COT Index (0-100 within trailing range)",
+    value=False,
+    help="Makes instruments of very different size comparable on one axis."
+)
+index_weeks = st.slider("COT Index Lookback (weeks)", min_value=26, max_value=520, value=COT_INDEX_WEEKS, step=1) if normalize else None
+max_gap = st.slider(
+    "Carry Values Forward over Missing Weeks (0 = leave gaps)",
+    min_value=0, max_value=8, value=0, step=1
+)
+start_date = st.date_input("Start Date", value=None)
+
+if not selected_names:
+    st.info("Select at least one instrument.")
+    st.stop()
+
+
+@st.cache_data(show_spinner=False)
+def load_overlay(dataset_code, type_category, metric, codes, fingerprint):
+    # `fingerprint` only keys the cache so the frame is rebuilt exactly when the stored data changes
+    return load_metric(store, dataset_code, type_category, metric, codes)
+
+
+codes = tuple(instrument_mapping[name] for name in selected_names)
+wide = load_overlay(dataset_code, type_category, metric, codes, store.fingerprint(dataset_code, type_category))
+wide = fill_gaps(wide, max_gap)
+if normalize:
+    # Computed on the full history so the trailing range is not cut off by the start date
+    wide = cot_index(wide, index_weeks)
+if start_date:
+    wide = wide[wide.index >= pd.Timestamp(start_date)]
+
+if wide.empty:
+    st.warning("No data for the selected instruments.")
+    st.stop()
+
+title = f"{metric} - COT Index ({index_weeks} weeks)" if normalize else metric
+fig = overlay_figure(wide, code_to_name, title, "COT Index" if normalize else metric)
+if normalize:
+    fig.update_layout(yaxis_range=[-5, 105])
+st.plotly_chart(fig, use_container_width=True)
+
+# Latest value of each instrument, with the date it was reported
+summary = pd.DataFrame({
+    "Instrument": [code_to_name.get(code, code) for code in wide.columns],
+    "Last Date": wide.apply(pd.Series.last_valid_index).values,
+    "Last Value": wide.ffill().iloc[-1].values,
+})
+st.dataframe(summary, hide_index=True)
@@ -0,0 +1,85 @@
+import streamlit as st
+import nasdaqdatalink
+import os
+import toml
+import json
+from alerts import ALERT_RULES_FILE, read_alerts, run_scan, validate_rules
+from cot_store import CotStore
+from file_utils import atomic_write, file_lock
+from instrument_registry import InstrumentRegistry, load_instrument_mapping
+
+
+st.title("CFTC Monitor - Positioning Alerts")
+
+# Try loading API Key from local file
+api_key = st.session_state.get("api_key", None)  # Use session state if already set
+
+if not api_key and os.path.exists("secrets.toml"):
+    try:
+        local_secrets = toml.load("secrets.toml")
+        api_key = local_secrets.get("NASDAQ_API_KEY")
+    except Exception as e:
+        st.error(f"Error loading local secrets: {e}")
+
+# If not found locally, try getting from Streamlit Cloud
+if not api_key:
+    api_key = st.secrets.get("NASDAQ_API_KEY", None)
+
+# Handle missing API key
+if not api_key:
+    st.error("API Key is missing! Please add it in Streamlit Secrets or `secrets.toml`.")
+    st.stop()
+
+# Set API Key for Nasdaq Data Link & store in session state
+st.session_state.api_key = api_key
+nasdaqdatalink.ApiConfig.api_key = api_key
+
+registry = InstrumentRegistry("instruments.json")
+instrument_mapping = load_instrument_mapping(registry.path, registry.version())
+code_to_name = {code: name for name, code in instrument_mapping.items()}
+
+# Run the weekly sync + scan on demand (normally scheduled via `python weekly_sync.py`)
+if st.button("Sync & Scan Now"):
+    with st.spinner("Syncing and evaluating alert rules..."):
+        try:
+            fired = run_scan(CotStore(), instrument_mapping.values())
+            st.success(f"{len(fired)} new alerts")
+        except Exception as e:
+            st.error(f"Error running alert scan: {e}")
+
+# Logged alerts
+st.subheader("Recent Alerts")
+alerts = read_alerts(limit=500)
+if alerts.empty:
+    st.info("No alerts logged yet.")
+else:
+    alerts.insert(0, "instrument", alerts["contract_code"].map(lambda code: code_to_name.get(code, code)))
+    selected_rules = st.multiselect("Filter by Rule", sorted(alerts["rule_id"].unique()))
+    if selected_rules:
+        alerts = alerts[alerts["rule_id"].isin(selected_rules)]
+    st.dataframe(alerts, use_container_width=True)
+
+# Rule editor
+st.subheader("Alert Rules")
+st.markdown("""
+Each rule watches one series per instrument: `dataset`, `type`, and either a `net` (e.g. `money_manager_net`)
+or a raw `column` (e.g. `largest_4_longs_net`).
+- **range_position** – position in the `window`-week min/max range (0 to 1), fires `above` / `below` a threshold
+- **zscore** – distance from the `window`-week mean in standard deviations
+- **sign_flip** – the value changed sign since the previous week
+- **change** – week-over-week change `above` / `below` a threshold
+""")
+
+rules_text = st.text_area(
+    "Rules (JSON)",
+    value=open(ALERT_RULES_FILE).read() if os.path.exists(ALERT_RULES_FILE) else "[]",
+    height=400
+)
+if st.button("Save Rules"):
+    try:
+        rules = validate_rules(json.loads(rules_text), CotStore())  # Also checked against the stored tables
+        with file_lock(ALERT_RULES_FILE):
+            atomic_write(ALERT_RULES_FILE, json.dumps(rules, indent=4))
+        st.success("Alert rules saved.")
+    except (json.JSONDecodeError, ValueError) as e:
+        st.error(f"Invalid rules: {e}")
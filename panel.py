@@ -0,0 +1,227 @@
+import os
+import json
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from cot_store import CotStore, DATA_DIR
+from file_utils import atomic_write, file_lock
+
+PANEL_DIR = os.path.join(DATA_DIR, "panel")
+PANEL_DTYPE = np.float32
+# Spare weeks allocated at the end of the week axis so new weeks are appended in place
+WEEK_CAPACITY_PADDING = 104
+
+
+class Panel:
+    """
+    Dense (instrument x week x field) float32 panel of one stored table, opened with `numpy.memmap`.
+
+    Several processes opening the same panel share the same physical pages through the OS
+    page cache; nothing is copied or unpickled. Missing observations are NaN.
+
+    Attributes:
+        values (np.ndarray): Read-only (instrument, week, field) view over the valid weeks.
+        instruments (List[str]): Contract codes along axis 0.
+        dates (pd.DatetimeIndex): Report dates along axis 1.
+        fields (List[str]): Column names along axis 2.
+    """
+
+    def __init__(self, directory: str):
+        try:
+            meta, storage = self._open(directory)
+        except FileNotFoundError:
+            # meta.json was replaced by a rebuild between reading it and mapping its data file
+            meta, storage = self._open(directory)
+        self.directory = directory
+        self.instruments: List[str] = meta["instruments"]
+        self.fields: List[str] = meta["fields"]
+        self.dates = pd.DatetimeIndex(pd.to_datetime(meta["dates"]))
+        self._instrument_index = {code: i for i, code in enumerate(self.instruments)}
+        self._field_index = {name: i for i, name in enumerate(self.fields)}
+        self.values = storage[:, :len(self.dates), :]
+
+    @staticmethod
+    def _open(directory: str):
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            meta = json.load(f)
+        storage = np.memmap(
+            os.path.join(directory, meta["file"]),
+            dtype=PANEL_DTYPE,
+            mode="r",
+            shape=tuple(meta["shape"])
+        )
+        return meta, storage
+
+    def field(self, name: str) -> np.ndarray:
+        """(instrument, week) view of one field."""
+        return self.values[:, :, self._field_index[name]]
+
+    def instrument(self, code: str) -> np.ndarray:
+        """(week, field) view of one instrument."""
+        return self.values[self._instrument_index[code]]
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """One field as a (date x contract_code) DataFrame."""
+        return pd.DataFrame(self.field(name).T, index=self.dates, columns=self.instruments)
+
+
+def panel_directory(dataset_code: str, type_category: str, root: str = PANEL_DIR) -> str:
+    return os.path.join(root, f"{dataset_code.replace('/', '_')}_{type_category}")
+
+
+def _numeric_fields(frame: pd.DataFrame) -> List[str]:
+    return [
+        col for col in frame.columns
+        if col not in ("contract_code", "date", "type") and pd.api.types.is_numeric_dtype(frame[col])
+    ]
+
+
+def _write_meta(directory: str, file_name: str, shape, instruments, dates, fields) -> None:
+    atomic_write(os.path.join(directory, "meta.json"), json.dumps({
+        "file": file_name,
+        "shape": list(shape),
+        "instruments": list(instruments),
+        "dates": [date.strftime("%Y-%m-%d") for date in dates],
+        "fields": list(fields),
+    }))
+
+
+def _fill(storage: np.ndarray, frame: pd.DataFrame, instruments: List[str], dates: pd.DatetimeIndex, fields: List[str], offset: int = 0) -> None:
+    # One fancy-indexed assignment instead of a Python loop over rows
+    instrument_idx = pd.Index(instruments).get_indexer(frame["contract_code"])
+    date_idx = dates.get_indexer(frame["date"])
+    keep = (instrument_idx >= 0) & (date_idx >= 0)
+    storage[instrument_idx[keep], date_idx[keep] + offset, :] = frame.loc[keep, fields].to_numpy(dtype=PANEL_DTYPE)
+
+
+def build_panel(
+        store: CotStore,
+        dataset_code: str,
+        type_category: str,
+        contract_codes: Iterable[str],
+        fields: Optional[List[str]] = None,
+        root: str = PANEL_DIR
+) -> Panel:
+    """
+    Build the panel of one stored table for `contract_codes` from scratch.
+
+    The date axis is the union of all stored report dates of those contracts. The data file is
+    written under a new name and published by atomically replacing meta.json, so processes that
+    already mapped the previous file keep a consistent view. The previous file is only deleted by
+    the rebuild after this one, so a reader that has just read the old meta.json can still map it.
+    """
+    contract_codes = sorted(set(contract_codes))
+    frame = store.load(dataset_code, type_category, contract_codes=contract_codes)
+    fields = fields or _numeric_fields(frame)
+    dates = pd.DatetimeIndex(sorted(frame["date"].unique()))
+
+    directory = panel_directory(dataset_code, type_category, root)
+    os.makedirs(directory, exist_ok=True)
+    with file_lock(os.path.join(directory, "meta.json")):
+        shape = (len(contract_codes), len(dates) + WEEK_CAPACITY_PADDING, len(fields))
+        file_name = f"values-{pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')}.f32"
+        storage = np.memmap(os.path.join(directory, file_name), dtype=PANEL_DTYPE, mode="w+", shape=shape)
+        storage[:] = np.nan
+        _fill(storage, frame, contract_codes, dates, fields)
+        storage.flush()
+        del storage
+
+        previous = _current_file(directory)
+        _write_meta(directory, file_name, shape, contract_codes, dates, fields)
+        for name in os.listdir(directory):
+            if name.startswith("values-") and name not in (file_name, previous):
+                os.remove(os.path.join(directory, name))  # Open maps stay valid on POSIX
+    return Panel(directory)
+
+
+def _current_file(directory: str) -> Optional[str]:
+    meta_path = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r") as f:
+        return json.load(f)["file"]
+
+
+def append_panel(store: CotStore, dataset_code: str, type_category: str, root: str = PANEL_DIR) -> Optional[Panel]:
+    """
+    Write stored rows the panel does not hold yet into it, in place: new weeks go into the spare
+    capacity, and rows that arrived late for weeks already on the axis (e.g. an instrument that
+    missed a release) fill their empty cells.
+    Which rows are missing is decided from the stored (contract_code, date) keys alone; only
+    those rows are then read in full. Revisions of weeks the panel already holds are not
+    detected here; rebuild the panel for those.
+
+    Returns:
+        Optional[Panel]: The updated panel, or None if it has to be rebuilt instead
+        (no panel yet, not enough spare weeks, or a stored date that is not on the axis).
+    """
+    directory = panel_directory(dataset_code, type_category, root)
+    if not os.path.exists(os.path.join(directory, "meta.json")):
+        return None
+
+    with file_lock(os.path.join(directory, "meta.json")):
+        panel = Panel(directory)
+        keys = store.load(dataset_code, type_category, contract_codes=panel.instruments, columns=[])
+        instrument_idx = pd.Index(panel.instruments).get_indexer(keys["contract_code"])
+        date_idx = panel.dates.get_indexer(keys["date"])
+        on_axis = date_idx >= 0
+        filled = ~np.isnan(panel.values).all(axis=2)  # (instrument, week)
+        missing = ~on_axis
+        missing[on_axis] = ~filled[instrument_idx[on_axis], date_idx[on_axis]]
+        if not missing.any():
+            return panel
+
+        missing_keys = keys[missing]
+        frame = store.load(
+            dataset_code,
+            type_category,
+            contract_codes=sorted(missing_keys["contract_code"].unique()),
+            start=missing_keys["date"].min()
+        )
+        frame = frame.merge(missing_keys[["contract_code", "date"]], on=["contract_code", "date"])
+
+        frame_dates = pd.DatetimeIndex(sorted(frame["date"].unique()))
+        last_date = panel.dates[-1] if len(panel.dates) else None
+        new_dates = frame_dates[frame_dates > last_date] if last_date is not None else frame_dates
+        if len(frame_dates.difference(panel.dates).difference(new_dates)):
+            return None  # A week inside the axis that the panel has no slot for
+
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            meta = json.load(f)
+        shape = tuple(meta["shape"])
+        if len(panel.dates) + len(new_dates) > shape[1]:
+            return None
+
+        dates = panel.dates.append(new_dates)
+        storage = np.memmap(os.path.join(directory, meta["file"]), dtype=PANEL_DTYPE, mode="r+", shape=shape)
+        _fill(storage, frame, panel.instruments, dates, panel.fields)
+        storage.flush()
+        del storage
+
+        # Readers only see the new weeks once meta.json lists their dates
+        if len(new_dates):
+            _write_meta(directory, meta["file"], shape, panel.instruments, dates, panel.fields)
+    return Panel(directory)
+
+
+def update_panel(
+        store: CotStore,
+        dataset_code: str,
+        type_category: str,
+        contract_codes: Iterable[str],
+        rebuild: bool = False,
+        root: str = PANEL_DIR
+) -> Panel:
+    """
+    Append new weeks in place when possible, otherwise rebuild (new instruments, capacity exhausted).
+    Pass `rebuild=True` after past weeks were revised (e.g. by `CotStore.verify_recent`).
+    """
+    contract_codes = sorted(set(contract_codes))
+    directory = panel_directory(dataset_code, type_category, root)
+    if not rebuild and os.path.exists(os.path.join(directory, "meta.json")) and Panel(directory).instruments == contract_codes:
+        panel = append_panel(store, dataset_code, type_category, root)
+        if panel is not None:
+            return panel
+    return build_panel(store, dataset_code, type_category, contract_codes, root=root)
@@ -0,0 +1,245 @@
+import os
+import pickle
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from chart_schema import add_net_columns
+from correlation import POSITIONING_NETS
+from cot_store import CotStore, DATA_DIR
+from file_utils import atomic_write, file_lock
+
+PERCENTILE_DIR = os.path.join(DATA_DIR, "percentiles")
+
+# Lookback windows in days; None is the full history
+LOOKBACK_WINDOWS: Dict[str, Optional[int]] = {
+    "1y": 365,
+    "3y": 3 * 365,
+    "5y": 5 * 365,
+    "all": None,
+}
+
+
+class SeriesPercentiles:
+    """
+    Sorted value index of one series over trailing lookback windows.
+
+    Each window keeps its values in a sorted array, so the percentile rank of any value is two
+    binary searches. Appending a week inserts its value into every window and removes the values
+    that fell out of the window, without re-sorting or rescanning the history. NaN values are
+    not indexed.
+    """
+
+    def __init__(self, windows: Dict[str, Optional[int]] = LOOKBACK_WINDOWS):
+        self.windows = dict(windows)
+        self.dates = np.empty(0, dtype="datetime64[ns]")  # Observed (non-NaN) weeks, in order
+        self.values = np.empty(0)
+        self.sorted: Dict[str, np.ndarray] = {name: np.empty(0) for name in self.windows}
+        self._start: Dict[str, int] = {name: 0 for name in self.windows}  # First history position inside each window
+        self._last_seen: Optional[np.datetime64] = None  # Latest week appended, including NaN weeks
+
+    @property
+    def last_date(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self._last_seen) if self._last_seen is not None else None
+
+    def append(self, date, value: float) -> None:
+        """
+        Add the observation of a week after `last_date`.
+
+        Raises:
+            ValueError: If `date` is not after `last_date` (revisions need a rebuild).
+        """
+        date = np.datetime64(pd.Timestamp(date), "ns")
+        if self._last_seen is not None and date <= self._last_seen:
+            raise ValueError(f"{date} is not after the last indexed date {self._last_seen}")
+        self._last_seen = date
+
+        # A NaN week adds no value but still moves the windows forward
+        observed = not np.isnan(value)
+        if observed:
+            self.dates = np.append(self.dates, date)
+            self.values = np.append(self.values, float(value))
+        for name, days in self.windows.items():
+            ordered = self.sorted[name]
+            if observed:
+                ordered = np.insert(ordered, np.searchsorted(ordered, value), value)
+            if days is not None:
+                cutoff = date - np.timedelta64(days, "D")
+                start = self._start[name]
+                while start < len(self.dates) and self.dates[start] <= cutoff:
+                    old = self.values[start]
+                    ordered = np.delete(ordered, np.searchsorted(ordered, old))
+                    start += 1
+                self._start[name] = start
+            self.sorted[name] = ordered
+
+    def rank(self, value: float, window: str = "all") -> float:
+        """
+        Percentile rank (0-100) of `value` within a window: the share of indexed values below it,
+        counting equal values as half. NaN for an empty window or a NaN value.
+        """
+        ordered = self.sorted[window]
+        if not len(ordered) or np.isnan(value):
+            return np.nan
+        below = np.searchsorted(ordered, value, side="left")
+        not_above = np.searchsorted(ordered, value, side="right")
+        return (below + not_above) / 2 / len(ordered) * 100
+
+    @classmethod
+    def from_series(cls, dates, values, windows: Dict[str, Optional[int]] = LOOKBACK_WINDOWS) -> "SeriesPercentiles":
+        """Build the index of a whole history with one sort per window."""
+        index = cls(windows)
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        values = np.asarray(values, dtype=float)
+        if len(dates):
+            index._last_seen = dates.max()
+        keep = ~np.isnan(values)
+        order = np.argsort(dates[keep], kind="stable")
+        dates, values = dates[keep][order], values[keep][order]
+
+        index.dates = dates
+        index.values = values
+        for name, days in windows.items():
+            start = 0
+            if days is not None and index._last_seen is not None:
+                start = int(np.searchsorted(dates, index._last_seen - np.timedelta64(days, "D"), side="right"))
+            index._start[name] = start
+            index.sorted[name] = np.sort(values[start:])
+        return index
+
+
+class PercentileIndex:
+    """
+    `SeriesPercentiles` for every (contract_code, column) of one table: every numeric column
+    plus the dataset's net columns from POSITIONING_NETS.
+    """
+
+    def __init__(self, dataset_code: str, windows: Dict[str, Optional[int]] = LOOKBACK_WINDOWS):
+        self.dataset_code = dataset_code
+        self.windows = dict(windows)
+        self.nets = dict(POSITIONING_NETS.get(dataset_code, {}))  # Formulas the index was built with
+        self.series: Dict[Tuple[str, str], SeriesPercentiles] = {}
+
+    def _with_nets(self, frame: pd.DataFrame) -> pd.DataFrame:
+        return add_net_columns(frame, self.nets)
+
+    @staticmethod
+    def _columns(frame: pd.DataFrame) -> List[str]:
+        return [
+            col for col in frame.columns
+            if col not in ("contract_code", "date", "type") and pd.api.types.is_numeric_dtype(frame[col])
+        ]
+
+    def contracts(self) -> List[str]:
+        return sorted({code for code, _ in self.series})
+
+    def last_date(self, contract_code: str) -> Optional[pd.Timestamp]:
+        dates = [series.last_date for (code, _), series in self.series.items()
+                 if code == contract_code and series.last_date is not None]
+        return max(dates) if dates else None
+
+    def extend(self, frame: pd.DataFrame) -> None:
+        """
+        Index a table's rows. Contracts seen for the first time are built in one pass; known
+        contracts only get the rows after their last indexed date appended.
+        """
+        frame = self._with_nets(frame)
+        columns = self._columns(frame)
+        frame = frame.sort_values("date")
+        for code, rows in frame.groupby("contract_code", sort=False):
+            dates = pd.to_datetime(rows["date"]).to_numpy()
+            for column in columns:
+                key = (code, column)
+                values = rows[column].to_numpy(dtype=float)
+                if key not in self.series:
+                    self.series[key] = SeriesPercentiles.from_series(dates, values, self.windows)
+                    continue
+                series = self.series[key]
+                newer = dates > np.datetime64(series.last_date) if series.last_date is not None else np.ones(len(dates), dtype=bool)
+                for date, value in zip(dates[newer], values[newer]):
+                    series.append(date, value)
+
+    def ranks(self, contract_code: str, values: Dict[str, float]) -> pd.DataFrame:
+        """
+        Percentile ranks of `values` (column -> value) in every window.
+
+        Returns:
+            pd.DataFrame: One row per column, one column per window; NaN for unindexed columns.
+        """
+        rows = {}
+        for column, value in values.items():
+            series = self.series.get((contract_code, column))
+            rows[column] = {
+                name: series.rank(value, name) if series is not None else np.nan
+                for name in self.windows
+            }
+        return pd.DataFrame.from_dict(rows, orient="index", columns=list(self.windows))
+
+    def latest_ranks(self, frame: pd.DataFrame, contract_code: str) -> pd.DataFrame:
+        """Percentile ranks of the latest row of `frame` for one contract, for every indexed column."""
+        rows = frame[frame["contract_code"] == contract_code] if "contract_code" in frame.columns else frame
+        if rows.empty:
+            return pd.DataFrame(columns=list(self.windows))
+        latest = self._with_nets(rows.loc[[pd.to_datetime(rows["date"]).idxmax()]])
+        return self.ranks(contract_code, {col: float(latest[col].iloc[0]) for col in self._columns(latest)})
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, dataset_code: str, windows: Dict[str, Optional[int]] = LOOKBACK_WINDOWS) -> "PercentileIndex":
+        index = cls(dataset_code, windows)
+        index.extend(frame)
+        return index
+
+
+def percentile_path(dataset_code: str, type_category: str, root: str = PERCENTILE_DIR) -> str:
+    return os.path.join(root, f"{dataset_code.replace('/', '_')}_{type_category}.pkl")
+
+
+def load_percentile_index(dataset_code: str, type_category: str, root: str = PERCENTILE_DIR) -> Optional[PercentileIndex]:
+    """
+    Return the persisted index of a stored table, or None if it has not been built or was built
+    with other net formulas than POSITIONING_NETS (appending would index new nets from recent weeks only).
+    """
+    path = percentile_path(dataset_code, type_category, root)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        index = pickle.load(f)
+    if getattr(index, "nets", None) != POSITIONING_NETS.get(dataset_code, {}):
+        return None
+    return index
+
+
+def update_percentile_index(
+        store: CotStore,
+        dataset_code: str,
+        type_category: str,
+        rebuild: bool = False,
+        root: str = PERCENTILE_DIR
+) -> PercentileIndex:
+    """
+    Bring the persisted index of a stored table up to date.
+
+    Only weeks after the last indexed date of each contract are read from the store and appended.
+    Pass `rebuild=True` after past weeks were revised (e.g. by `CotStore.verify_recent`).
+    """
+    path = percentile_path(dataset_code, type_category, root)
+    os.makedirs(root, exist_ok=True)
+    with file_lock(path):
+        index = None if rebuild else load_percentile_index(dataset_code, type_category, root)
+        if index is None:
+            index = PercentileIndex.from_frame(store.load(dataset_code, type_category), dataset_code)
+        else:
+            known = index.contracts()
+            last_dates = [index.last_date(code) for code in known]
+            if known and None not in last_dates:
+                recent = store.load(dataset_code, type_category, contract_codes=known, start=min(last_dates) + pd.Timedelta(days=1))
+            else:
+                recent = store.load(dataset_code, type_category, contract_codes=known)
+            index.extend(recent)
+            # Contracts stored but not indexed yet (e.g. newly registered) are built from their full history
+            missing = sorted(set(store.last_dates(dataset_code, type_category)) - set(known))
+            if missing:
+                index.extend(store.load(dataset_code, type_category, contract_codes=missing))
+        atomic_write(path, pickle.dumps(index))
+    return index
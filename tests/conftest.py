@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+import data_source
+
+
+@pytest.fixture
+def source(monkeypatch):
+    """
+    Replace `data_source.get_table` with a fake over in-memory tables, keyed by (dataset, type).
+    Supports the contract_code and date ('gt' / 'gte') filters the store sends.
+    """
+    tables = {}
+
+    def get_table(dataset_code, contract_code=None, type=None, date=None, qopts=None, paginate=False):
+        frame = tables.get((dataset_code, type), pd.DataFrame(columns=["contract_code", "type", "date"]))
+        frame = frame[frame["contract_code"].isin(contract_code)]
+        if date and "gt" in date:
+            frame = frame[frame["date"] > pd.Timestamp(date["gt"])]
+        if date and "gte" in date:
+            frame = frame[frame["date"] >= pd.Timestamp(date["gte"])]
+        return frame.reset_index(drop=True)
+
+    monkeypatch.setattr(data_source, "get_table", get_table)
+    return tables
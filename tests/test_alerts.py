@@ -0,0 +1,84 @@
+import json
+
+import pandas as pd
+import pytest
+
+from alerts import run_scan, validate_rules
+from cot_store import CotStore
+
+RULES = [{
+    "id": "longs_jump",
+    "dataset": "QDL/FCR",
+    "type": "F_ALL_CR",
+    "column": "largest_4_longs_net",
+    "kind": "change",
+    "window": 4,
+    "above": 5
+}]
+
+
+def weekly_rows(codes, weeks):
+    # The net rises by 10 every week, so the rule fires on every week it evaluates
+    dates = pd.date_range("2020-01-07", periods=weeks, freq="7D")
+    return pd.DataFrame([
+        {"contract_code": code, "type": "F_ALL_CR", "date": date, "largest_4_longs_net": 10.0 * i}
+        for code in codes for i, date in enumerate(dates)
+    ])
+
+
+# Mistyped column: `largest_4_longs_net`
+TYPO_RULE = dict(RULES[0], id="typo", column="largest_4_long_net")
+
+
+def scan(tmp_path, codes, rules=RULES):
+    rules_path = tmp_path / "rules.json"
+    rules_path.write_text(json.dumps(rules))
+    return run_scan(
+        CotStore(str(tmp_path / "data")),
+        codes,
+        rules_path=str(rules_path),
+        sinks=[],
+        state_path=str(tmp_path / "state.pkl")
+    )
+
+
+def test_first_scan_of_unstored_table_only_alerts_latest_week(tmp_path, source):
+    source[("QDL/FCR", "F_ALL_CR")] = weekly_rows(["A", "B"], 20)
+
+    alerts = scan(tmp_path, ["A", "B"])
+
+    assert sorted((a["contract_code"], a["date"]) for a in alerts) == [("A", "2020-05-19"), ("B", "2020-05-19")]
+
+
+def test_newly_registered_instrument_only_alerts_latest_week(tmp_path, source):
+    source[("QDL/FCR", "F_ALL_CR")] = weekly_rows(["A"], 20)
+    scan(tmp_path, ["A"])
+
+    source[("QDL/FCR", "F_ALL_CR")] = weekly_rows(["A", "B"], 21)
+    alerts = scan(tmp_path, ["A", "B"])
+
+    assert sorted((a["contract_code"], a["date"]) for a in alerts) == [("A", "2020-05-26"), ("B", "2020-05-26")]
+
+
+def test_rule_on_missing_column_is_skipped(tmp_path, source):
+    source[("QDL/FCR", "F_ALL_CR")] = weekly_rows(["A"], 20)
+    with pytest.warns(UserWarning, match="typo"):
+        scan(tmp_path, ["A"], [TYPO_RULE] + RULES)
+
+    source[("QDL/FCR", "F_ALL_CR")] = weekly_rows(["A"], 21)
+    with pytest.warns(UserWarning, match="typo"):
+        alerts = scan(tmp_path, ["A"], [TYPO_RULE] + RULES)
+
+    assert [(a["rule_id"], a["date"]) for a in alerts] == [("longs_jump", "2020-05-26")]
+
+
+def test_validate_rules_checks_the_stored_table(tmp_path, source):
+    source[("QDL/FCR", "F_ALL_CR")] = weekly_rows(["A"], 20)
+    store = CotStore(str(tmp_path / "data"))
+    store.sync("QDL/FCR", "F_ALL_CR", ["A"])
+
+    assert validate_rules(RULES, store) == RULES
+    with pytest.raises(ValueError, match="no column largest_4_long_net"):
+        validate_rules([TYPO_RULE], store)
+    with pytest.raises(ValueError, match="no contract B"):
+        validate_rules([dict(RULES[0], contracts=["B"])], store)
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from correlation import RollingCorrelation
+
+WINDOW = 12
+MIN_PERIODS = 6
+
+
+@pytest.fixture
+def weekly():
+    # Weekly changes of four instruments with scattered missing weeks, and one instrument
+    # without reports for longer than a window
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2020-01-07", periods=60, freq="7D")
+    frame = pd.DataFrame(rng.normal(size=(60, 4)), index=dates, columns=["A", "B", "C", "D"])
+    frame = frame.mask(rng.random(frame.shape) < 0.2)
+    frame.iloc[20:40, 3] = np.nan
+    return frame
+
+
+def test_incremental_matches_pairwise_complete_corr(weekly):
+    engine = RollingCorrelation.from_frame(weekly.iloc[:30], WINDOW, MIN_PERIODS)
+    too_few = False
+
+    for end in range(30, len(weekly) + 1):
+        if end > 30:
+            engine.update_frame(weekly.iloc[:end])
+        expected = weekly.iloc[end - WINDOW:end].corr(min_periods=MIN_PERIODS)
+        pd.testing.assert_frame_equal(engine.corr(), expected, check_exact=False, atol=1e-12)
+        too_few |= bool(expected.isna().any().any())
+
+    assert too_few  # Pairs with fewer than MIN_PERIODS common weeks were NaN along the way
+    assert engine.matches(weekly)
+    assert not engine.matches(weekly.mul(2))
@@ -0,0 +1,44 @@
+import pandas as pd
+
+from cot_store import CotStore
+
+
+def weekly_rows(codes, start, end):
+    dates = pd.date_range(start, end, freq="W-TUE")
+    return pd.DataFrame([
+        {"contract_code": code, "type": "F_ALL", "date": date, "money_manager_longs": float(i)}
+        for code in codes for i, date in enumerate(dates)
+    ])
+
+
+def test_verify_recent_replaces_only_the_revised_block(tmp_path, source):
+    today = pd.Timestamp.today().normalize()
+    last_year = str(today.year - 1)
+    rows = weekly_rows(["A", "B"], f"{today.year - 3}-01-01", today - pd.Timedelta(days=7))
+    source[("QDL/FON", "F_ALL")] = rows
+    store = CotStore(str(tmp_path))
+    store.sync("QDL/FON", "F_ALL", ["A", "B"])
+    before = store.load("QDL/FON", "F_ALL")
+    blocks_before = store.manifest("QDL/FON", "F_ALL")["blocks"]
+    fingerprint_before = store.fingerprint("QDL/FON", "F_ALL")
+
+    # The CFTC revises one past week of A
+    revised_date = rows.loc[rows["date"].dt.year == int(last_year), "date"].iloc[10]
+    revised = rows.copy()
+    revised.loc[(revised["contract_code"] == "A") & (revised["date"] == revised_date), "money_manager_longs"] = -1.0
+    source[("QDL/FON", "F_ALL")] = revised
+
+    assert store.verify_recent("QDL/FON", "F_ALL", years=2) == [("A", last_year)]
+
+    after = store.load("QDL/FON", "F_ALL")
+    changed = after.compare(before)
+    assert len(changed) == 1
+    assert after.loc[changed.index[0], ["contract_code", "date"]].tolist() == ["A", revised_date]
+    assert after.loc[changed.index[0], "money_manager_longs"] == -1.0
+
+    blocks_after = store.manifest("QDL/FON", "F_ALL")["blocks"]
+    assert {(code, year) for code in blocks_after for year in blocks_after[code]
+            if blocks_after[code][year] != blocks_before[code][year]} == {("A", last_year)}
+    assert store.fingerprint("QDL/FON", "F_ALL") != fingerprint_before
+
+    assert store.verify_recent("QDL/FON", "F_ALL", years=2) == []
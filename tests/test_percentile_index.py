@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from percentile_index import LOOKBACK_WINDOWS, SeriesPercentiles
+
+
+def weekly_series(weeks):
+    # Few distinct values so ranks have ties, and some weeks without a report
+    rng = np.random.default_rng(1)
+    dates = pd.date_range("2014-01-07", periods=weeks, freq="7D")
+    values = rng.integers(0, 20, size=weeks).astype(float)
+    values[rng.random(weeks) < 0.1] = np.nan
+    return dates, values
+
+
+def brute_force_rank(dates, values, last_date, days, value):
+    keep = ~np.isnan(values)
+    if days is not None:
+        keep &= dates > last_date - pd.Timedelta(days=days)
+    window = values[keep]
+    return ((window < value).sum() + (window <= value).sum()) / 2 / len(window) * 100
+
+
+def test_appending_weeks_matches_a_full_build():
+    dates, values = weekly_series(400)  # Longer than the 5y window
+    index = SeriesPercentiles.from_series(dates[:50], values[:50])
+
+    for end in range(51, len(dates) + 1):
+        index.append(dates[end - 1], values[end - 1])
+        full = SeriesPercentiles.from_series(dates[:end], values[:end])
+
+        assert index.last_date == full.last_date == dates[end - 1]
+        for name, days in LOOKBACK_WINDOWS.items():
+            np.testing.assert_array_equal(index.sorted[name], full.sorted[name])
+            for value in (-1.0, 0.0, 7.0, 19.0, 25.0):
+                expected = brute_force_rank(dates[:end], values[:end], dates[end - 1], days, value)
+                assert index.rank(value, name) == full.rank(value, name) == expected
+
+
+def test_nan_week_moves_the_windows():
+    dates, values = weekly_series(120)
+    values[-10:] = np.nan
+    index = SeriesPercentiles.from_series(dates[:-10], values[:-10])
+
+    for date, value in zip(dates[-10:], values[-10:]):
+        index.append(date, value)
+
+    full = SeriesPercentiles.from_series(dates, values)
+    assert index.last_date == dates[-1]
+    for name in LOOKBACK_WINDOWS:
+        np.testing.assert_array_equal(index.sorted[name], full.sorted[name])
+    assert np.isnan(index.rank(np.nan))
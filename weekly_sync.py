@@ -0,0 +1,98 @@
+import os
+import argparse
+import toml
+import nasdaqdatalink
+import data_source
+from alerts import ALERT_RULES_FILE, FileSink, WebhookSink, run_scan
+from cot_store import CotStore, DATA_DIR
+from instrument_registry import InstrumentRegistry
+from panel import update_panel
+from percentile_index import update_percentile_index
+
+
+def load_api_key() -> str:
+    """Read the Nasdaq Data Link API key from secrets.toml or the NASDAQ_API_KEY environment variable."""
+    if os.path.exists("secrets.toml"):
+        api_key = toml.load("secrets.toml").get("NASDAQ_API_KEY")
+        if api_key:
+            return api_key
+    api_key = os.environ.get("NASDAQ_API_KEY")
+    if not api_key:
+        raise SystemExit("API Key is missing! Add NASDAQ_API_KEY to secrets.toml or the environment.")
+    return api_key
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync the local COT store and scan the new weeks for positioning alerts.")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Local store directory")
+    parser.add_argument("--rules", default=ALERT_RULES_FILE, help="Alert rules JSON file")
+    parser.add_argument("--webhook", help="Also POST alerts to this URL")
+    parser.add_argument("--verify-years", type=int, default=0,
+                        help="Re-check the last N calendar years of every stored table for CFTC revisions (0 = skip)")
+    parser.add_argument("--http-stats", action="store_true", help="Print request count, bytes and latency of the Nasdaq Data Link fetches")
+    args = parser.parse_args()
+
+    nasdaqdatalink.ApiConfig.api_key = load_api_key()
+
+    sinks = [FileSink(os.path.join(args.data_dir, "alerts.jsonl"))]
+    if args.webhook:
+        sinks.append(WebhookSink(args.webhook))
+
+    codes = list(InstrumentRegistry("instruments.json").load().values())
+    store = CotStore(args.data_dir)
+
+    alerts = run_scan(
+        store,
+        codes,
+        rules_path=args.rules,
+        sinks=sinks,
+        state_path=os.path.join(args.data_dir, "alert_state.pkl")
+    )
+    # After the scan, so the new weeks are evaluated as new rows by the alert rules first
+    revised_tables = set()
+    if args.verify_years:
+        for dataset_code, type_category in store.tables():
+            revised = store.verify_recent(dataset_code, type_category, years=args.verify_years)
+            if revised:
+                revised_tables.add((dataset_code, type_category))
+                print(f"{dataset_code} {type_category}: rewrote {len(revised)} blocks ({', '.join(f'{code}/{year}' for code, year in revised)})")
+
+    # Refresh the memory-mapped panels read by cross-instrument screens
+    for dataset_code, type_category in store.tables():
+        update_panel(
+            store,
+            dataset_code,
+            type_category,
+            codes,
+            rebuild=(dataset_code, type_category) in revised_tables,
+            root=os.path.join(args.data_dir, "panel")
+        )
+
+    # Append the new weeks to the percentile index shown on the monitor page; revised tables are rebuilt
+    for dataset_code, type_category in store.tables():
+        update_percentile_index(
+            store,
+            dataset_code,
+            type_category,
+            rebuild=(dataset_code, type_category) in revised_tables,
+            root=os.path.join(args.data_dir, "percentiles")
+        )
+
+    for alert in alerts:
+        print(f"{alert['date']} {alert['contract_code']} [{alert['rule_id']}] {alert['message']}")
+    print(f"{len(alerts)} alerts")
+
+    if args.http_stats and not data_source.is_offline():
+        stats = data_source.transport().summary()
+        if stats["requests"]:
+            print(
+                f"HTTP: {stats['requests']} requests, {stats['rows']} rows, "
+                f"{stats['wire_bytes'] / 2 ** 20:.1f} MB on the wire ({stats['compression_ratio']:.1f}x compressed), "
+                f"p50 {stats['p50_ms']:.0f} ms, p95 {stats['p95_ms']:.0f} ms, "
+                f"first byte {stats['time_to_first_byte_ms'] / 1000:.1f} s / download {stats['download_ms'] / 1000:.1f} s / "
+                f"decode {stats['decode_ms'] / 1000:.1f} s"
+            )
+
+
+if __name__ == "__main__":
+    main()